@@ -5,55 +5,29 @@ import json
 from urllib.request import urlopen
 from PIL import Image, ImageTk
 import io
-import requests
+from movie_app.services.http_client import upstream
 from movie_app.services.search_service import SearchService
+from movie_app.connection_pool import ConnectionPool
 
 HOST = '127.0.0.1'
 PORT = 5000
+POOL_SIZE = 4
+REVIEW_PAGE_SIZE = 50
+MAX_REVIEWS_SHOWN = 200
 
 # ----- Network Communication -----
+# Keep-alive sockets shared by every view, so repeated actions skip the TCP connect.
+connection_pool = ConnectionPool(HOST, PORT, size=POOL_SIZE, timeout=15)
+
 def send_request(action, data):
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(15)  # Increased timeout to 15 seconds
-            s.connect((HOST, PORT))
-            request = json.dumps({"action": action, "data": data})
-            s.sendall(request.encode())
-
-            chunks = []
-            while True:
-                try:
-                    chunk = s.recv(4096)
-                    if not chunk:
-                        break
-                    chunks.append(chunk)
-                    
-                    try:
-                        full_response = b''.join(chunks).decode()
-                        json.loads(full_response)  # Test if it's valid JSON
-                        break  # If we can parse it as JSON, we're done
-                    except json.JSONDecodeError:
-                        # Not complete yet, continue receiving
-                        continue
-                except socket.timeout:
-                    if chunks:  # If we have some data but timed out
-                        break
-                    else:
-                        return {"status": "error", "message": "Request timed out"}
-            
-            if not chunks:
-                return {"status": "error", "message": "No data received from server"}
-                
-            full_response = b''.join(chunks).decode()
-            try:
-                return json.loads(full_response)
-            except json.JSONDecodeError:
-                return {"status": "error", "message": f"Invalid JSON response: {full_response[:100]}..."}
-                
+        return connection_pool.request(action, data)
     except socket.timeout:
         return {"status": "error", "message": "Connection timed out"}
     except ConnectionRefusedError:
         return {"status": "error", "message": "Could not connect to server. Is it running?"}
+    except json.JSONDecodeError as e:
+        return {"status": "error", "message": f"Invalid JSON response: {e}"}
     except Exception as e:
         return {"status": "error", "message": f"Network error: {str(e)}"}
 # ----- GUI -----
@@ -162,29 +136,24 @@ class MovieApp(tk.Tk):
         self.results_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
     
-    def remove_favorite(self, movie):
-        """Handle removing a movie from favorites."""
-        try:
-            with open("movie_app/db/users.json", "r") as f:
-                users_data = json.load(f)
-
-            user_data = next((user for user in users_data if user["id"] == self.user_id), None)
-
-            if user_data and "favorites" in user_data:
-                if movie in user_data["favorites"]:
-                    user_data["favorites"].remove(movie)
+    def fetch_favorites(self):
+        """The user's favorite movie IDs, as the server has them."""
+        response = send_request("get_favorites", {"username": self.username})
+        if response.get("status") != "success":
+            print(f"Error loading favorites: {response.get('message')}")
+            return []
+        return response["favorites"]
 
-                    with open("movie_app/db/users.json", "w") as f:
-                        json.dump(users_data, f, indent=4)
+    def stored_favorite_id(self, movie_id):
+        """The favorite matching movie_id in the form it was saved (int or string), or None."""
+        for fav_id in self.fetch_favorites():
+            if str(fav_id) == str(movie_id):
+                return fav_id
+        return None
 
-                    messagebox.showinfo("Removed", f"{movie['title']} has been removed from favorites.")
-                    self.show_favorites_view()  # Refresh favorites view
-                else:
-                    messagebox.showwarning("Not Found", "Movie not found in favorites.")
-            else:
-                messagebox.showwarning("Error", "User or favorites not found.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Error removing favorite: {str(e)}")
+    def remove_favorite(self, movie):
+        """Handle removing a movie from favorites."""
+        self.remove_favorite_by_id(movie.get("id"))
 
     def register(self):
         """Handle user registration."""
@@ -297,7 +266,7 @@ class MovieApp(tk.Tk):
         if image_url:
             try:
                 # Fetch and display the poster image
-                response = requests.get(image_url, stream=True, timeout=5)
+                response = upstream.get(image_url, timeout=5)
                 response.raise_for_status()
                 
                 img_data = Image.open(io.BytesIO(response.content))
@@ -332,26 +301,7 @@ class MovieApp(tk.Tk):
         # Check if movie is in favorites
         is_favorite = False
         try:
-            with open("movie_app/db/users.json", "r") as f:
-                users_data = json.load(f)
-                
-            # Handle both dictionary and list format
-            if isinstance(users_data, dict):
-                for username, user_data in users_data.items():
-                    if user_data.get("id") == self.user_id:
-                        favorites = user_data.get("favorites", [])
-                        # Convert to strings for comparison
-                        favorite_ids = [str(fav_id) for fav_id in favorites]
-                        is_favorite = str(movie_id) in favorite_ids
-                        break
-            else:
-                for user_data in users_data:
-                    if user_data.get("id") == self.user_id:
-                        favorites = user_data.get("favorites", [])
-                        # Convert to strings for comparison
-                        favorite_ids = [str(fav_id) for fav_id in favorites]
-                        is_favorite = str(movie_id) in favorite_ids
-                        break
+            is_favorite = self.stored_favorite_id(movie_id) is not None
         except Exception as e:
             print(f"Error checking favorites: {str(e)}")
 
@@ -463,162 +413,56 @@ class MovieApp(tk.Tk):
     
     
     def load_comments(self, movie_id):
-        """Load comments for a specific movie from comments.json."""
-        try:
-            # Ensure movie_id is a string for consistent lookup
-            movie_id_str = str(movie_id)
-            
-            try:
-                with open("movie_app/db/comments.json", "r") as f:
-                    comments_data = json.load(f)
-            except FileNotFoundError:
-                # Create the file if it doesn't exist
-                comments_data = {}
-                with open("movie_app/db/comments.json", "w") as f:
-                    json.dump(comments_data, f, indent=4)
-            
-            # Return comments for this movie, or an empty list if none exist
-            return comments_data.get(movie_id_str, {}).get("comments", [])
-        
-        except Exception as e:
-            print(f"Error loading comments: {str(e)}")
-            return []
+        """Load a movie's reviews from the server, one page at a time."""
+        comments = []
+        cursor = None
+        while len(comments) < MAX_REVIEWS_SHOWN:
+            response = send_request("get_reviews", {"movie_id": movie_id, "cursor": cursor, "limit": REVIEW_PAGE_SIZE})
+            if response.get("status") != "success":
+                print(f"Error loading comments: {response.get('message')}")
+                break
+            comments.extend(review["text"] for review in response["reviews"])
+            cursor = response.get("next_cursor")
+            if cursor is None:
+                break
+        return comments
 
     def add_comment(self, movie_id, comment_text):
-        """Add a comment to a movie in comments.json."""
-        try:
-            # Ensure movie_id is a string for consistent storage
-            movie_id_str = str(movie_id)
-            
-            # Load existing comments
-            try:
-                with open("movie_app/db/comments.json", "r") as f:
-                    comments_data = json.load(f)
-            except FileNotFoundError:
-                comments_data = {}
-            except json.JSONDecodeError:
-                comments_data = {}
-            
-            # Initialize movie entry if it doesn't exist
-            if movie_id_str not in comments_data:
-                comments_data[movie_id_str] = {"comments": []}
-            
-            # Add the new comment
-            comments_data[movie_id_str]["comments"].append(comment_text)
-            
-            # Save back to file
-            with open("movie_app/db/comments.json", "w") as f:
-                json.dump(comments_data, f, indent=4)
-            
+        """Send a review for a movie to the server."""
+        response = send_request("add_review", {"username": self.username, "movie_id": movie_id, "comment": comment_text})
+        if response.get("status") == "success":
             messagebox.showinfo("Success", "Your review has been added!")
             return True
-        
-        except Exception as e:
-            print(f"Error adding comment: {str(e)}")
-            messagebox.showerror("Error", f"Could not add your review: {str(e)}")
-            return False
+        messagebox.showerror("Error", f"Could not add your review: {response.get('message')}")
+        return False
     
     # Also need to update the toggle_favorite function to ensure consistent ID format
     def toggle_favorite(self, movie):
         """Add or remove a movie ID to/from favorites."""
         try:
-            with open("movie_app/db/users.json", "r") as f:
-                users_data = json.load(f)
-
-            # Handle both dictionary and list format for users data
-            if isinstance(users_data, dict):
-                # Dictionary format (username: user_data)
-                for username, user_data in users_data.items():
-                    if user_data["id"] == self.user_id:
-                        favorites = user_data.get("favorites", [])
-                        movie_id = movie.get("id")
-                        
-                        # Convert all IDs to strings for consistent comparison
-                        favorite_ids = [str(fav_id) for fav_id in favorites]
-                        movie_id_str = str(movie_id)
-                        
-                        # Debug print
-                        print(f"Current favorites before toggle: {favorites}")
-                        print(f"Toggling movie: {movie.get('name', 'Unnamed')} with ID: {movie_id_str}")
-
-                        # Check if movie is in favorites
-                        is_favorite = movie_id_str in favorite_ids
-                        if is_favorite:
-                            # Find and remove the ID (keeping its original format)
-                            for i, fav_id in enumerate(favorites):
-                                if str(fav_id) == movie_id_str:
-                                    del favorites[i]
-                                    break
-                            messagebox.showinfo("Removed", f"{movie.get('name', 'Movie')} removed from favorites.")
-                        else:
-                            # Add it in its original format
-                            favorites.append(movie_id)
-                            messagebox.showinfo("Added", f"{movie.get('name', 'Movie')} added to favorites.")
-
-                        user_data["favorites"] = favorites
-
-                        with open("movie_app/db/users.json", "w") as f:
-                            json.dump(users_data, f, indent=4)
-
-                        print(f"Current favorites after toggle: {favorites}")  # Debug print
-                        
-                        # Refresh the view based on current view
-                        if hasattr(self, 'search_box') and self.search_box.winfo_exists():
-                            # We're in search view - just refresh current view
-                            self.show_search_view()
-                        else:
-                            # We're likely in favorites view - refresh that
-                            self.show_favorites_view()
-                        return
+            movie_id = movie.get("id")
+            stored_id = self.stored_favorite_id(movie_id)
+            if stored_id is not None:
+                response = send_request("remove_favorite", {"username": self.username, "movie_id": stored_id})
+                title, text = "Removed", f"{movie.get('name', 'Movie')} removed from favorites."
             else:
-                # List format (list of user objects)
-                for user_data in users_data:
-                    if user_data["id"] == self.user_id:
-                        favorites = user_data.get("favorites", [])
-                        movie_id = movie.get("id")
-                        
-                        # Convert all IDs to strings for consistent comparison
-                        favorite_ids = [str(fav_id) for fav_id in favorites]
-                        movie_id_str = str(movie_id)
-                        
-                        # Debug print
-                        print(f"Current favorites before toggle: {favorites}")
-                        print(f"Toggling movie: {movie.get('name', 'Unnamed')} with ID: {movie_id_str}")
-
-                        # Check if movie is in favorites
-                        is_favorite = movie_id_str in favorite_ids
-                        if is_favorite:
-                            # Find and remove the ID (keeping its original format)
-                            for i, fav_id in enumerate(favorites):
-                                if str(fav_id) == movie_id_str:
-                                    del favorites[i]
-                                    break
-                            messagebox.showinfo("Removed", f"{movie.get('name', 'Movie')} removed from favorites.")
-                        else:
-                            # Add it in its original format
-                            favorites.append(movie_id)
-                            messagebox.showinfo("Added", f"{movie.get('name', 'Movie')} added to favorites.")
-
-                        user_data["favorites"] = favorites
-
-                        with open("movie_app/db/users.json", "w") as f:
-                            json.dump(users_data, f, indent=4)
-
-                        print(f"Current favorites after toggle: {favorites}")  # Debug print
-                        
-                        # Refresh the view based on current view
-                        if hasattr(self, 'search_box') and self.search_box.winfo_exists():
-                            # We're in search view - just refresh current view
-                            self.show_search_view()
-                        else:
-                            # We're likely in favorites view - refresh that
-                            self.show_favorites_view()
-                        return
+                response = send_request("add_favorite", {"username": self.username, "movie_id": movie_id})
+                title, text = "Added", f"{movie.get('name', 'Movie')} added to favorites."
+            if response.get("status") != "success":
+                messagebox.showerror("Error", response.get("message", "Could not update favorites."))
+                return
+            messagebox.showinfo(title, text)
 
-            messagebox.showerror("Error", "User not found.")
+            # Refresh the view based on current view
+            if hasattr(self, 'search_box') and self.search_box.winfo_exists():
+                # We're in search view - just refresh current view
+                self.show_search_view()
+            else:
+                # We're likely in favorites view - refresh that
+                self.show_favorites_view()
         except Exception as e:
             messagebox.showerror("Error", f"Error toggling favorite: {str(e)}")
-    
+
     def display_search_results(self, results):
         """Display movie search results as clickable cards with posters."""
         for widget in self.results_frame.winfo_children():
@@ -650,17 +494,10 @@ class MovieApp(tk.Tk):
         row = 0
         col = 0
 
-        # Load the user's favorites from the database
+        # Load the user's favorites from the server, as strings for comparison
         favorite_ids = set()
         try:
-            with open("movie_app/db/users.json", "r") as f:
-                users_data = json.load(f)
-                
-            # Find user by ID and get their favorites
-            for username, user_data in users_data.items():
-                if user_data.get("id") == self.user_id:
-                    favorite_ids = set(user_data.get("favorites", []))
-                    break
+            favorite_ids = {str(fav_id) for fav_id in self.fetch_favorites()}
         except Exception as e:
             print(f"Error loading favorites: {str(e)}")
 
@@ -676,8 +513,8 @@ class MovieApp(tk.Tk):
             # Display poster image
             if image_url:
                 try:
-                    # Use requests to fetch the image
-                    response = requests.get(image_url, stream=True, timeout=5)
+                    # Fetch the image over the shared connection pool
+                    response = upstream.get(image_url, timeout=5)
                     response.raise_for_status()
                     
                     # Convert the image data
@@ -712,7 +549,7 @@ class MovieApp(tk.Tk):
             title_label.pack(pady=(0, 10))
             
             # Add favorite button
-            is_favorite = movie_id in favorite_ids
+            is_favorite = str(movie_id) in favorite_ids
             favorite_text = "⭐ Remove from Favorites" if is_favorite else "⭐ Add to Favorites"
             favorite_btn = tk.Button(
                 card_frame, 
@@ -742,25 +579,19 @@ class MovieApp(tk.Tk):
     
     def remove_favorite_by_id(self, movie_id):
         try:
-            with open("movie_app/db/users.json", "r") as f:
-                users_data = json.load(f)
-
-            for user_data in users_data.values():
-                if user_data["id"] == self.user_id:
-                    if movie_id in user_data["favorites"]:
-                        user_data["favorites"].remove(movie_id)
-                        with open("movie_app/db/users.json", "w") as f:
-                            json.dump(users_data, f, indent=4)
-
-                        messagebox.showinfo("Removed", f"Movie {movie_id} removed from favorites.")
-                        self.show_favorites_view()
-                        return
-                    else:
-                        messagebox.showwarning("Not Found", "Movie ID not in favorites.")
-                        return
+            stored_id = self.stored_favorite_id(movie_id)
+            if stored_id is None:
+                messagebox.showwarning("Not Found", "Movie ID not in favorites.")
+                return
+            response = send_request("remove_favorite", {"username": self.username, "movie_id": stored_id})
+            if response.get("status") != "success":
+                messagebox.showerror("Error", response.get("message", "Could not remove favorite."))
+                return
+            messagebox.showinfo("Removed", f"Movie {movie_id} removed from favorites.")
+            self.show_favorites_view()
         except Exception as e:
             messagebox.showerror("Error", f"Error removing favorite: {str(e)}")
-    
+
     def show_favorites_view(self):
         """Display the user's favorite movies in a grid layout with clickable cards."""
         for widget in self.content_panel.winfo_children():
@@ -798,23 +629,7 @@ class MovieApp(tk.Tk):
             # Load favorite IDs from user data
             favorite_ids = []
             try:
-                with open("movie_app/db/users.json", "r") as f:
-                    users_data = json.load(f)
-                
-                # Handle both dictionary and list format for users data
-                if isinstance(users_data, dict):
-                    # Dictionary format (username: user_data)
-                    for username, user_data in users_data.items():
-                        if user_data.get("id") == self.user_id:
-                            favorite_ids = user_data.get("favorites", [])
-                            break
-                else:
-                    # List format (list of user objects)
-                    for user_data in users_data:
-                        if user_data.get("id") == self.user_id:
-                            favorite_ids = user_data.get("favorites", [])
-                            break
-            
+                favorite_ids = self.fetch_favorites()
             except Exception as e:
                 print(f"Error loading user data: {str(e)}")
                 
@@ -898,8 +713,8 @@ class MovieApp(tk.Tk):
                 # Display poster image
                 if image_url:
                     try:
-                        # Use requests to fetch the image
-                        response = requests.get(image_url, stream=True, timeout=5)
+                        # Fetch the image over the shared connection pool
+                        response = upstream.get(image_url, timeout=5)
                         response.raise_for_status()
                         
                         # Convert the image data
@@ -0,0 +1,78 @@
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from services.comment_store import JsonCommentStore
+from services.group_commit import DEFAULT_MAX_BATCH, configure_group_commit
+from services.metrics import LatencyHistogram
+from services.user_store import UserStore
+
+
+def run(make_write, threads, writes):
+    """Run `writes` writes on each of `threads` threads; returns (elapsed seconds, latency histogram)."""
+    histogram = LatencyHistogram()
+    lock = threading.Lock()
+
+    def worker(index):
+        write = make_write(index)
+        latencies = []
+        for i in range(writes):
+            started = time.perf_counter()
+            write(i)
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+        with lock:
+            for micros in latencies:
+                histogram.record(micros)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - started, histogram
+
+
+def favorites_writer(workdir, threads):
+    store = UserStore(os.path.join(workdir, "users.json"), durability="sync")
+    for i in range(threads):
+        store.create_user(f"user{i}", {"id": str(i), "password": None, "favorites": []})
+    return store, lambda index: (lambda i: store.add_favorite(f"user{index}", i))
+
+
+def reviews_writer(workdir, threads):
+    store = JsonCommentStore(os.path.join(workdir, "reviews.jsonl"), legacy_path=None)
+    return store, lambda index: (lambda i: store.add_review(str(i % 100), f"user{index}", "a review"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write throughput and latency with group commit")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--windows", default="0,1,2,5", help="comma-separated commit windows in ms")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    args = parser.parse_args(argv)
+
+    print(f"{'store':<10} {'window':>8} {'batch':>6} {'writes/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    configs = [(0.0, 1)] + [(float(w) / 1000, args.max_batch) for w in args.windows.split(",")]
+    for name, make_store in (("favorites", favorites_writer), ("reviews", reviews_writer)):
+        for window, max_batch in configs:
+            # max_batch=1 is the baseline: one fsync per write, as without group commit.
+            configure_group_commit(window, max_batch)
+            workdir = tempfile.mkdtemp()
+            try:
+                store, make_write = make_store(workdir, args.threads)
+                elapsed, histogram = run(make_write, args.threads, args.writes)
+                batches = store.stats()["group_commit"]
+            finally:
+                shutil.rmtree(workdir)
+            total = args.threads * args.writes
+            print(f"{name:<10} {window * 1000:>6.1f}ms {max_batch:>6} {total / elapsed:>10,.0f} "
+                  f"{histogram.percentile(50) / 1000:>8.2f} {histogram.percentile(99) / 1000:>8.2f} "
+                  f"{batches['mean_batch']:>11}")
+
+
+if __name__ == "__main__":
+    main()
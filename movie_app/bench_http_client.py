@@ -0,0 +1,105 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from services.http_client import HttpClient
+from services.metrics import LatencyHistogram
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small Watchmode-like JSON body, keeping the connection open."""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive replies would stall on delayed ACKs.
+    disable_nagle_algorithm = True
+    latency = 0.0
+    fail_rate = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            status, body = 503, b'{"error": "overloaded"}'
+        else:
+            status, body = 200, json.dumps({"id": 1, "title": "Stub", "poster": "https://example.invalid/p.jpg"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(get, url, threads, requests_per_thread):
+    """Returns (elapsed seconds, latency histogram, non-200 replies)."""
+    histogram = LatencyHistogram()
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        latencies = []
+        failed = 0
+        for _ in range(requests_per_thread):
+            started = time.perf_counter()
+            if get(url).status_code != 200:
+                failed += 1
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+        with lock:
+            for micros in latencies:
+                histogram.record(micros)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - started, histogram, errors[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upstream GETs: a new connection per call vs the shared pool")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="requests per thread")
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds the stub takes per reply")
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="share of stub replies that are 503")
+    parser.add_argument("--pool-size", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    StubHandler.latency, StubHandler.fail_rate = args.latency, args.fail_rate
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    stub.daemon_threads = True
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{stub.server_address[1]}/v1/title/1/details/"
+
+    # Plain HTTP on loopback: real Watchmode calls also pay TLS on every new connection, so the gap there is larger.
+    pooled = HttpClient(pool_size=args.pool_size)
+    clients = (("requests.get", lambda u: requests.get(u, timeout=10)),
+               ("HttpClient (no retries)", HttpClient(pool_size=args.pool_size, retries=0).get),
+               ("HttpClient", pooled.get))
+    total = args.threads * args.requests
+    print(f"{args.threads} threads x {args.requests} requests, stub latency {args.latency * 1000:.0f} ms, "
+          f"{args.fail_rate:.0%} 503s")
+    print(f"{'client':<24} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'connections':>12} {'non-200':>8}")
+    for name, get in clients:
+        StubHandler.connections = 0
+        elapsed, histogram, errors = run(get, url, args.threads, args.requests)
+        print(f"{name:<24} {total / elapsed:>8,.0f} {histogram.percentile(50) / 1000:>8.2f} "
+              f"{histogram.percentile(99) / 1000:>8.2f} {StubHandler.connections:>12} {errors:>8}")
+    print("HttpClient stats:", pooled.stats())
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+import server
+from client_handler import auth, search
+from protocol import FrameReader, send_message
+from services.metrics import LatencyHistogram
+from services.password_hashing import DEFAULT_MAX_PENDING, DEFAULT_PROCESSES
+from services.storage import configure_storage
+
+
+class CannedResponse:
+    """Stands in for Watchmode, so the benchmark measures the server rather than the network."""
+    status_code = 200
+
+    def json(self):
+        return {"title_results": [{"id": i, "name": f"Movie {i}"} for i in range(1, 6)],
+                "poster": "https://example.invalid/poster.jpg"}
+
+
+# Never reused, even across runs: each search misses the search cache and each add_favorite adds.
+request_numbers = itertools.count()
+
+
+class Client:
+    """One blocking connection; each thread uses its own."""
+
+    def __init__(self, port):
+        self.sock = socket.create_connection((server.HOST, port))
+        self.reader = FrameReader(self.sock)
+
+    def request(self, action, data):
+        send_message(self.sock, {"action": action, "data": data})
+        return self.reader.read_message()
+
+    def close(self):
+        self.sock.close()
+
+
+def measure(port, seconds, logins):
+    """Alternate search and add_favorite for `seconds` while `logins` threads log in nonstop.
+
+    Returns ({action: histogram}, login counts by status).
+    """
+    histograms = {"search": LatencyHistogram(), "add_favorite": LatencyHistogram()}
+    outcomes = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def login_loop(index):
+        client = Client(port)
+        while time.monotonic() < deadline:
+            response = client.request("login", {"username": f"burst{index}", "password": "secret"})
+            with lock:
+                outcomes[response["status"]] = outcomes.get(response["status"], 0) + 1
+            if response["status"] == "busy":
+                time.sleep(response["retry_after"])
+        client.close()
+
+    burst = [threading.Thread(target=login_loop, args=(i,)) for i in range(logins)]
+    for t in burst:
+        t.start()
+    client = Client(port)
+    while time.monotonic() < deadline:
+        i = next(request_numbers)
+        for action, payload in (("search", {"query": f"matrix {i}"}),
+                                ("add_favorite", {"username": "probe", "movie_id": i})):
+            started = time.perf_counter()
+            client.request(action, payload)
+            histograms[action].record((time.perf_counter() - started) * 1_000_000)
+    client.close()
+    for t in burst:
+        t.join()
+    return histograms, outcomes
+
+
+def check_prefork_login(port, processes=2):
+    """Register and log in against `python server.py --processes N`-style workers; exits on failure."""
+    server.PORT = port
+    # Forked, like the workers, so the supervisor keeps this process's storage settings.
+    supervisor = multiprocessing.get_context("fork").Process(target=server.start_prefork_server,
+                                                             args=(processes, "threaded"))
+    supervisor.start()
+    try:
+        for _ in range(50):
+            try:
+                client = Client(port)
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+        else:
+            raise SystemExit("pre-fork server did not start")
+        registered = client.request("register", {"username": "prefork", "password": "secret"})
+        logged_in = client.request("login", {"username": "prefork", "password": "secret"})
+        client.close()
+    finally:
+        # SIGINT lets the supervisor terminate and join its workers.
+        os.kill(supervisor.pid, signal.SIGINT)
+        supervisor.join()
+    print(f"pre-fork ({processes} workers): register {registered['status']}, login {logged_in['status']}")
+    if registered["status"] != "success" or logged_in["status"] != "success":
+        raise SystemExit(f"pre-fork login failed: {registered} {logged_in}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="search/add_favorite latency during a burst of logins")
+    parser.add_argument("--port", type=int, default=5041)
+    parser.add_argument("--seconds", type=float, default=5.0, help="length of each run")
+    parser.add_argument("--logins", type=int, default=16, help="threads logging in nonstop")
+    parser.add_argument("--hash-processes", type=int, default=DEFAULT_PROCESSES)
+    parser.add_argument("--hash-max-pending", type=int, default=DEFAULT_MAX_PENDING)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        configure_storage("sqlite", os.path.join(workdir, "bench.sqlite3"))
+        search._get = lambda endpoint, url, params, timeout=10: CannedResponse()
+        # Keep the canned details out of the real db/details_cache.sqlite3.
+        search.details_cache.path = os.path.join(workdir, "details_cache.sqlite3")
+        check_prefork_login(args.port + 1)
+        server.PORT = args.port
+        threading.Thread(target=server.start_server, daemon=True).start()
+        time.sleep(0.5)
+        auth.create_account({"username": "probe", "password": "secret"})
+        for i in range(args.logins):
+            auth.create_account({"username": f"burst{i}", "password": "secret"})
+
+        print(f"{os.cpu_count()} CPU(s), {args.logins} login threads, {args.seconds:.0f}s per run")
+        print(f"{'run':<32} {'action':<13} {'p50 ms':>8} {'p99 ms':>8} {'logins':>8} {'busy':>6}")
+        runs = (("no logins", 0, None, None),
+                ("logins hashed on request thread", args.logins, 0, 1_000_000),
+                ("logins hashed in process pool", args.logins, args.hash_processes, args.hash_max_pending))
+        for name, logins, processes, max_pending in runs:
+            if processes is not None:
+                auth.hasher.configure(processes, max_pending)
+            histograms, outcomes = measure(args.port, args.seconds, logins)
+            for action, histogram in histograms.items():
+                print(f"{name:<32} {action:<13} {histogram.percentile(50) / 1000:>8.2f} "
+                      f"{histogram.percentile(99) / 1000:>8.2f} {outcomes.get('success', 0):>8} "
+                      f"{outcomes.get('busy', 0):>6}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
+import os
 import socket
+import sys
 import threading
 
+# Run as a script from movie_app/chatrooms, so make the sibling services package importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.log import configure_logging, get_logger
+
 HOST = '127.0.0.1'
 PORT = 5050
 clients = []
+log = get_logger("chat")
 
 def broadcast(msg, sender_sock):
     for client in clients:
@@ -11,6 +18,7 @@ def broadcast(msg, sender_sock):
             try:
                 client.send(msg)
             except:
+                log.warning("broadcast_failed", clients=len(clients))
                 clients.remove(client)
 
 def handle_client(conn):
@@ -25,17 +33,20 @@ def handle_client(conn):
             break
     conn.close()
     clients.remove(conn)
+    log.info("chat_client_left", clients=len(clients))
 
 def start_server():
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server.bind((HOST, PORT))
     server.listen()
-    print(f"Chat Server running on {HOST}:{PORT}")
+    log.info("chat_listening", host=HOST, port=PORT)
 
     while True:
         conn, addr = server.accept()
         clients.append(conn)
+        log.info("chat_client_joined", peer=addr, clients=len(clients))
         threading.Thread(target=handle_client, args=(conn,), daemon=True).start()
 
 if __name__ == "__main__":
+    configure_logging()
     start_server()
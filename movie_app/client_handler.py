@@ -1,52 +1,198 @@
-import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.log import DroppingQueueHandler, get_logger
+from services.metrics import Counters, MetricsRegistry, store_metrics
+from services import storage
+from protocol import FrameReader, send_message
+from worker_pool import ServerBusy, WorkerPool
 from services.auth_service import AuthService
 from services.search_service import SearchService
 from services.favorite_service import FavoriteService
 from services.comment_service import CommentService
 
+log = get_logger("server")
+
 auth = AuthService()
 search = SearchService()
 favorites = FavoriteService()
 comments = CommentService()
+SERVICES = {"auth": auth, "search": search, "favorites": favorites, "comments": comments}
+
+# Action name -> handler(payload). Populated by register_action at the bottom of this module.
+ACTIONS = {}
+# Sub-requests of a batch that only read state can run side by side; actions registered
+# as mutating write, so they act as ordering barriers inside a batch.
+MUTATING_ACTIONS = set()
+action_metrics = MetricsRegistry()
+# Connection and traffic counters shared by the threaded and asyncio servers.
+server_counters = Counters()
+MAX_BATCH_SIZE = 50
+batch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="batch")
+
+# Created by the server at startup (after any pre-fork) rather than at import time.
+request_pool = None
+
+def configure_request_pool(workers, max_queue):
+    global request_pool
+    request_pool = WorkerPool(workers, max_queue)
+    return request_pool
 
 def handle_client(client_socket):
+    send_lock = threading.Lock()
+    server_counters.incr("connections_total")
+    server_counters.incr("connections_open")
     with client_socket:
+        reader = FrameReader(client_socket)
         while True:
             try:
-                data = client_socket.recv(4096)
-                if not data:
+                request = reader.read_message()
+                if request is None:
                     break
-                request = json.loads(data.decode())
-                print("[SERVER] Received:", request)
-                response = route_request(request)
-                client_socket.sendall(json.dumps(response).encode())
+                server_counters.incr("bytes_in", reader.last_frame_size)
+                log.debug("request_received", sampled=True, action=request.get("action"),
+                          request_id=request.get("id"), data=request.get("data"))
+                try:
+                    future = request_pool.submit(run_request, request)
+                except ServerBusy as busy:
+                    send_response(client_socket, send_lock, tag_response(request, busy.response()))
+                    continue
+                if "id" in request:
+                    # Requests that carry an id are answered out of order, so a slow search
+                    # does not hold up the quick actions queued behind it on this socket.
+                    future.add_done_callback(
+                        lambda f: send_response(client_socket, send_lock, f.result()))
+                    continue
+                with send_lock:
+                    send_counted(client_socket, future.result())
             except ConnectionResetError:
-                print("[SERVER] Client disconnected unexpectedly.")
+                log.info("client_disconnected", reason="connection reset")
                 break
             except Exception as e:
-                print("[SERVER ERROR]", str(e))
+                log.error("connection_error", error=str(e))
                 try:
-                    client_socket.sendall(json.dumps({'status': 'error', 'message': str(e)}).encode())
+                    with send_lock:
+                        send_counted(client_socket, {'status': 'error', 'message': str(e)})
                 except Exception:
-                    print("[SERVER] Could not send error response (client may be gone).")
+                    log.warning("send_failed", reason="client may be gone")
                 break
+    server_counters.incr("connections_open", -1)
+
+
+def tag_response(request, response):
+    """Echo the request id, if any, so the client can match out-of-order responses."""
+    if "id" in request:
+        return {**response, "id": request["id"]}
+    return response
+
+
+def run_request(request):
+    """route_request that reports failures as an error response instead of raising."""
+    try:
+        return tag_response(request, route_request(request))
+    except Exception as e:
+        log.log(logging.ERROR, "request_failed", exc_info=True, action=request.get("action"), error=str(e))
+        return tag_response(request, {'status': 'error', 'message': str(e)})
+
+
+def send_counted(client_socket, response):
+    server_counters.incr("bytes_out", send_message(client_socket, response))
+
+
+def send_response(client_socket, send_lock, response):
+    try:
+        with send_lock:
+            send_counted(client_socket, response)
+    except OSError:
+        log.warning("send_failed", reason="client may be gone")
+
+
+def register_action(name, handler, mutating=False):
+    ACTIONS[name] = handler
+    if mutating:
+        MUTATING_ACTIONS.add(name)
 
 
 def route_request(request):
     action = request.get("action")
     payload = request.get("data", {})
 
-    if action == "register":
-        return auth.create_account(payload)
-    elif action == "login":
-        return auth.authenticate(payload)
-    elif action == "search":
-        return search.search_movie(payload)
-    elif action == "add_favorite":
-        return favorites.add_to_favorites(payload)
-    elif action == "remove_favorite":
-        return favorites.remove_from_favorites(payload)
-    elif action == "add_review":
-        return comments.add_review(payload)
-    else:
+    handler = ACTIONS.get(action)
+    if handler is None:
         return {"status": "error", "message": "Invalid action"}
+    return action_metrics.timed(action, handler, payload)
+
+
+def server_stats(payload):
+    server = server_counters.snapshot()
+    server["active_threads"] = threading.active_count()
+    server["log_records_dropped"] = DroppingQueueHandler.dropped
+    return {
+        "status": "success",
+        "server": server,
+        "request_pool": request_pool.stats() if request_pool else None,
+        "actions": action_metrics.snapshot(),
+        "upstream": search.upstream_metrics.snapshot(),
+        "http_client": search.http.stats(),
+        "coalescing": search.coalescing_stats(),
+        "store": store_metrics.snapshot(),
+        "user_store": storage.user_backend().stats(),
+        "recommender": favorites.recommender.stats(),
+        "password_hasher": auth.hasher.stats(),
+        "comment_store": storage.comment_backend().stats(),
+        "caches": {name: service.cache_stats() for name, service in SERVICES.items()
+                   if hasattr(service, "cache_stats")},
+    }
+
+
+def run_sub_request(sub_request):
+    if not isinstance(sub_request, dict):
+        return {"status": "error", "message": "Batch entries must be objects"}
+    if sub_request.get("action") == "batch":
+        return {"status": "error", "message": "Nested batches are not allowed"}
+    try:
+        return route_request(sub_request)
+    except Exception as e:
+        log.log(logging.ERROR, "request_failed", exc_info=True, action=sub_request.get("action"), error=str(e))
+        return {"status": "error", "message": str(e)}
+
+
+def run_batch(payload):
+    """Run a list of sub-requests and return their responses in the same order.
+
+    Consecutive read-only sub-requests run in parallel; a mutating one waits for
+    everything before it and finishes before anything after it starts.
+    """
+    sub_requests = payload.get("requests")
+    if not isinstance(sub_requests, list):
+        return {"status": "error", "message": "Batch requires a list of requests"}
+    if len(sub_requests) > MAX_BATCH_SIZE:
+        return {"status": "error", "message": f"Batch exceeds {MAX_BATCH_SIZE} requests"}
+
+    results = []
+    pending = []
+    for sub_request in sub_requests:
+        action = sub_request.get("action") if isinstance(sub_request, dict) else None
+        if action in MUTATING_ACTIONS:
+            results.extend(future.result() for future in pending)
+            pending = []
+            results.append(run_sub_request(sub_request))
+        else:
+            pending.append(batch_executor.submit(run_sub_request, sub_request))
+    results.extend(future.result() for future in pending)
+    return {"status": "success", "results": results}
+
+
+register_action("register", auth.create_account, mutating=True)
+register_action("login", auth.authenticate)
+register_action("search", search.search_movie)
+register_action("add_favorite", favorites.add_to_favorites, mutating=True)
+register_action("remove_favorite", favorites.remove_from_favorites, mutating=True)
+register_action("get_favorites", favorites.get_favorites)
+register_action("movie_favorite_count", favorites.movie_favorite_count)
+register_action("top_favorites", favorites.top_favorites)
+register_action("recommendations", favorites.recommendations)
+register_action("add_review", comments.add_review, mutating=True)
+register_action("get_reviews", comments.get_reviews)
+register_action("batch", run_batch)
+register_action("stats", server_stats)
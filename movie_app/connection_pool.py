@@ -0,0 +1,199 @@
+import itertools
+import socket
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from movie_app.protocol import FrameReader, send_message
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = 15
+DEFAULT_MAX_IDLE = 60
+# A "busy" rejection means the server never ran the request, so it is always safe to resend.
+BUSY_RETRIES = 2
+
+
+class MultiplexedConnection:
+    """One keep-alive socket carrying many concurrent requests.
+
+    Every request is tagged with an id; a background reader thread matches each
+    response to its waiting Future by that id, so responses may arrive in any order.
+    """
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Responses can legitimately take longer than `timeout`; per-request waits enforce it instead.
+        self.sock.settimeout(None)
+        self.reader = FrameReader(self.sock)
+        self.last_used = time.monotonic()
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        threading.Thread(target=self._read_loop, daemon=True).start()
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    def is_healthy(self):
+        return not self.closed
+
+    def _read_loop(self):
+        error = ConnectionError("Server closed the connection")
+        try:
+            while True:
+                response = self.reader.read_message()
+                if response is None:
+                    break
+                with self._lock:
+                    future = self._pending.pop(response.pop("id", None), None)
+                if future is not None:
+                    future.set_result(response)
+        except (OSError, ValueError) as e:
+            error = ConnectionError(f"Connection lost: {e}")
+        self._fail_pending(error)
+
+    def _fail_pending(self, error):
+        with self._lock:
+            self.closed = True
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(error)
+        self.close()
+
+    def submit(self, action, data):
+        """Send a request and return a Future that resolves to its response."""
+        future = Future()
+        with self._lock:
+            if self.closed:
+                raise ConnectionError("Connection is closed")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                send_message(self.sock, {"id": request_id, "action": action, "data": data})
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self._fail_pending(ConnectionError(f"Connection lost: {e}"))
+            raise ConnectionError(f"Send failed: {e}") from e
+        self.last_used = time.monotonic()
+        return future
+
+    def forget(self, future):
+        """Stop waiting for `future` (its caller gave up); a late response to it is dropped."""
+        with self._lock:
+            for request_id, pending in self._pending.items():
+                if pending is future:
+                    del self._pending[request_id]
+                    break
+
+    def close(self):
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of up to `size` multiplexed keep-alive connections to the request server.
+
+    Requests go to the healthy connection with the fewest requests in flight; a new
+    connection is opened only while the pool is below `size`. Connections the server
+    has closed are noticed by their reader thread and replaced on the next request,
+    and connections idle for longer than `max_idle` seconds are dropped. A request
+    whose send fails on a reused connection is retried once on another one.
+    """
+
+    def __init__(self, host, port, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, max_idle=DEFAULT_MAX_IDLE):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._connections = []
+        self._connecting = 0  # connections being opened, counted against `size`
+        self._lock = threading.Condition()
+
+    def _connect(self):
+        return MultiplexedConnection(self.host, self.port, self.timeout)
+
+    def _prune(self):
+        """With the lock held: drop closed connections and ones idle for longer than `max_idle`."""
+        now = time.monotonic()
+        live = []
+        for conn in self._connections:
+            if conn.is_healthy() and (conn.in_flight or now - conn.last_used <= self.max_idle):
+                live.append(conn)
+            else:
+                conn.close()
+        self._connections = live
+
+    def _pick(self):
+        """Return (connection, reused) for the next request."""
+        with self._lock:
+            while True:
+                self._prune()
+                opened = len(self._connections) + self._connecting
+                least_busy = min(self._connections, key=lambda c: c.in_flight, default=None)
+                if least_busy is not None and (least_busy.in_flight == 0 or opened >= self.size):
+                    return least_busy, True
+                if opened < self.size:
+                    break
+                # Every slot is taken by a connection still being opened; wait for one of them.
+                self._lock.wait()
+            self._connecting += 1
+        return self._open(), False
+
+    def _open(self):
+        """Connect in a slot already reserved in `_connecting`, which is released either way."""
+        conn = None
+        try:
+            conn = self._connect()
+            return conn
+        finally:
+            with self._lock:
+                self._connecting -= 1
+                if conn is not None:
+                    self._connections.append(conn)
+                self._lock.notify_all()
+
+    def _submit(self, action, data):
+        """Return (connection, future) for a new request."""
+        conn, reused = self._pick()
+        try:
+            return conn, conn.submit(action, data)
+        except ConnectionError:
+            if not reused:
+                raise
+            # The failed connection has closed itself, so _pick drops it and can open a replacement.
+            conn, _ = self._pick()
+            return conn, conn.submit(action, data)
+
+    def submit(self, action, data):
+        return self._submit(action, data)[1]
+
+    def request(self, action, data):
+        for attempt in range(BUSY_RETRIES + 1):
+            conn, future = self._submit(action, data)
+            try:
+                response = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                conn.forget(future)
+                raise socket.timeout("Timed out waiting for the server response")
+            if response.get("status") != "busy" or attempt == BUSY_RETRIES:
+                return response
+            time.sleep(response.get("retry_after", 0.1))
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
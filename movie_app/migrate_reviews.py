@@ -0,0 +1,21 @@
+import argparse
+import os
+from services.comment_store import LEGACY_COMMENTS_DB, REVIEWS_DB
+from services.review_format import VERSION, convert
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Convert reviews to the version {VERSION} reviews format")
+    parser.add_argument("--source", default=LEGACY_COMMENTS_DB,
+                        help="comments.json (its .journal, if any, is included)")
+    parser.add_argument("--dest", default=REVIEWS_DB)
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.dest):
+        raise SystemExit(f"{args.dest} already exists; move it aside first")
+    count = convert([args.source, args.source + ".journal"], args.dest)
+    print(f"Wrote {count} reviews to {args.dest}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import argparse
+from services.comment_store import REVIEWS_DB, JsonCommentStore
+from services.sqlite_store import SQLITE_DB, SqliteStore, migrate_from_json
+from services.user_store import USER_DB
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy users.json and reviews.jsonl into a SQLite database")
+    parser.add_argument("--users", default=USER_DB)
+    parser.add_argument("--reviews", default=REVIEWS_DB)
+    parser.add_argument("--sqlite-path", default=SQLITE_DB)
+    args = parser.parse_args(argv)
+
+    # Fold any journaled reviews into the snapshot so the migration sees all of them.
+    JsonCommentStore(args.reviews).compact()
+    store = SqliteStore(args.sqlite_path)
+    try:
+        counts = migrate_from_json(args.users, args.reviews, store)
+    finally:
+        store.close()
+    print(f"Migrated {counts['users']} users, {counts['favorites']} favorites "
+          f"and {counts['reviews']} reviews into {args.sqlite_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import struct
+
+# Every message on the wire is a 4-byte big-endian body length followed by a UTF-8 JSON body.
+HEADER = struct.Struct("!I")
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+def encode_message(obj):
+    """Serialize a JSON-compatible object into a single length-prefixed frame."""
+    body = json.dumps(obj).encode()
+    if len(body) > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message of {len(body)} bytes exceeds limit of {MAX_MESSAGE_SIZE}")
+    return HEADER.pack(len(body)) + body
+
+
+def send_message(sock, obj):
+    """Send one frame and return its size in bytes."""
+    frame = encode_message(obj)
+    sock.sendall(frame)
+    return len(frame)
+
+
+def _check_length(length):
+    if length > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Incoming message of {length} bytes exceeds limit of {MAX_MESSAGE_SIZE}")
+
+
+class FrameReader:
+    """Reads length-prefixed frames from a blocking socket into one reusable buffer."""
+
+    def __init__(self, sock, initial_size=64 * 1024):
+        self.sock = sock
+        self._buffer = bytearray(initial_size)
+        self.last_frame_size = 0
+
+    def _recv_exactly(self, size):
+        """Fill the first `size` bytes of the buffer. Returns False on EOF before any byte."""
+        if len(self._buffer) < size:
+            self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+        view = memoryview(self._buffer)
+        received = 0
+        while received < size:
+            n = self.sock.recv_into(view[received:size])
+            if n == 0:
+                if received == 0:
+                    return False
+                raise ConnectionError("Connection closed in the middle of a message")
+            received += n
+        return True
+
+    def read_message(self):
+        """Return the next decoded message, or None if the peer closed the connection cleanly."""
+        if not self._recv_exactly(HEADER.size):
+            return None
+        (length,) = HEADER.unpack_from(self._buffer)
+        _check_length(length)
+        if not self._recv_exactly(length):
+            raise ConnectionError("Connection closed in the middle of a message")
+        self.last_frame_size = HEADER.size + length
+        return json.loads(bytes(self._buffer[:length]))
+
+
+class AsyncFrameReader:
+    """asyncio counterpart of FrameReader for a StreamReader."""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.last_frame_size = 0
+
+    async def read_message(self):
+        try:
+            header = await self.reader.readexactly(HEADER.size)
+        except asyncio.IncompleteReadError as e:
+            if not e.partial:
+                return None
+            raise ConnectionError("Connection closed in the middle of a message")
+        (length,) = HEADER.unpack(header)
+        _check_length(length)
+        try:
+            body = await self.reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Connection closed in the middle of a message")
+        self.last_frame_size = HEADER.size + length
+        return json.loads(body)
@@ -1,21 +1,238 @@
+import argparse
+import asyncio
+import multiprocessing
+import signal
 import socket
 import threading
-from client_handler import handle_client
+import time
+from client_handler import (configure_request_pool, favorites, handle_client, run_request, search, server_counters,
+                            tag_response)
+from protocol import AsyncFrameReader, encode_message
+from services.details_cache import DETAILS_CACHE_BYTES
+from services.group_commit import DEFAULT_MAX_BATCH, DEFAULT_WINDOW, configure_group_commit
+from services.log import DEFAULT_LEVEL, DEFAULT_SAMPLE_RATE, configure_logging, get_logger
+from services.password_hashing import DEFAULT_MAX_PENDING, DEFAULT_PROCESSES, password_hasher
+from services.search_service import SEARCH_CACHE_BYTES, SEARCH_CACHE_TTL
+from services.sqlite_store import SQLITE_DB
+from services.storage import BACKENDS, configure_storage
+from services.user_store import DEFAULT_FLUSH_INTERVAL, DURABILITY_MODES, user_store
+from worker_pool import DEFAULT_MAX_QUEUE, DEFAULT_WORKERS, ServerBusy
 
 HOST = '127.0.0.1'
 PORT = 5000
+BACKLOG = 1024
+RESTART_DELAY = 1.0
+# Seconds between full recommendation rebuilds in each pre-forked worker.
+PREFORK_RECOMMENDER_REBUILD = 60
 
-def start_server():
+log = get_logger("server")
+
+def make_listener(reuse_port=False):
     server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # Lets a restarted server (or a respawned worker) rebind while old connections sit in TIME_WAIT.
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        # Every pre-forked worker binds its own socket; the kernel spreads connections across them.
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     server.bind((HOST, PORT))
-    server.listen(5)
-    print(f"[SERVER] Listening on {HOST}:{PORT}")
+    server.listen(BACKLOG)
+    return server
+
+def start_server(workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, reuse_port=False):
+    configure_request_pool(workers, max_queue)
+    server = make_listener(reuse_port)
+    log.info("listening", host=HOST, port=PORT, mode="threaded", workers=workers, max_queue=max_queue)
 
     while True:
         client_socket, addr = server.accept()
-        print(f"[CONNECTION] Accepted from {addr}")
-        thread = threading.Thread(target=handle_client, args=(client_socket,))
+        log.info("connection_accepted", peer=addr)
+        # Connection threads only read and frame requests; the work itself runs on the bounded pool.
+        thread = threading.Thread(target=handle_client, args=(client_socket,), daemon=True)
         thread.start()
 
+
+async def handle_async_client(reader, writer, pool):
+    """Serve one connection on the event loop; blocking service calls run on the worker pool."""
+    write_lock = asyncio.Lock()
+    in_flight = set()
+
+    async def send(response):
+        frame = encode_message(response)
+        async with write_lock:
+            writer.write(frame)
+            await writer.drain()
+        server_counters.incr("bytes_out", len(frame))
+
+    async def respond(request, future):
+        response = await asyncio.wrap_future(future)
+        try:
+            await send(response)
+        except OSError:
+            log.warning("send_failed", reason="client may be gone")
+
+    frames = AsyncFrameReader(reader)
+    server_counters.incr("connections_total")
+    server_counters.incr("connections_open")
+    try:
+        while True:
+            try:
+                request = await frames.read_message()
+                if request is None:
+                    break
+                server_counters.incr("bytes_in", frames.last_frame_size)
+                log.debug("request_received", sampled=True, action=request.get("action"),
+                          request_id=request.get("id"), data=request.get("data"))
+                try:
+                    future = pool.submit(run_request, request)
+                except ServerBusy as busy:
+                    await send(tag_response(request, busy.response()))
+                    continue
+                if "id" in request:
+                    task = asyncio.create_task(respond(request, future))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    continue
+                await send(await asyncio.wrap_future(future))
+            except ConnectionResetError:
+                log.info("client_disconnected", reason="connection reset")
+                break
+            except Exception as e:
+                log.error("connection_error", error=str(e))
+                try:
+                    await send({'status': 'error', 'message': str(e)})
+                except Exception:
+                    log.warning("send_failed", reason="client may be gone")
+                break
+    finally:
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        server_counters.incr("connections_open", -1)
+        writer.close()
+
+
+async def serve_async(workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, reuse_port=False):
+    pool = configure_request_pool(workers, max_queue)
+
+    async def on_connect(reader, writer):
+        log.info("connection_accepted", peer=writer.get_extra_info("peername"))
+        await handle_async_client(reader, writer, pool)
+
+    server = await asyncio.start_server(on_connect, sock=make_listener(reuse_port))
+    log.info("listening", host=HOST, port=PORT, mode="asyncio", workers=workers, max_queue=max_queue)
+    async with server:
+        await server.serve_forever()
+
+
+def start_async_server(workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, reuse_port=False):
+    asyncio.run(serve_async(workers, max_queue, reuse_port))
+
+
+def run_worker(mode, workers, max_queue, log_level, log_sample):
+    # The parent's log writer thread does not survive the fork.
+    configure_logging(log_level, log_sample)
+    # The supervisor stops workers with SIGTERM; treat it like Ctrl-C so the cleanup below runs.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    log.info("worker_starting", mode=mode)
+    try:
+        if mode == "asyncio":
+            start_async_server(workers, max_queue, reuse_port=True)
+        else:
+            start_server(workers, max_queue, reuse_port=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Worker processes exit without running atexit hooks, which would otherwise stop the hashers.
+        password_hasher.close()
+
+
+def start_prefork_server(processes, mode, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE,
+                         log_level=DEFAULT_LEVEL, log_sample=DEFAULT_SAMPLE_RATE):
+    """Run `processes` workers that share PORT through SO_REUSEPORT, restarting any that die."""
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("SO_REUSEPORT is not available on this platform")
+    # Workers inherit the store, storage, commit, hashing and cache settings made in __main__,
+    # which only fork carries over (spawn is the macOS default, forkserver Linux's from 3.14).
+    context = multiprocessing.get_context("fork")
+
+    def spawn():
+        # Not daemonic: workers start their own password hashing processes, which daemons may not do.
+        # The finally below terminates and joins them instead.
+        process = context.Process(target=run_worker, args=(mode, workers, max_queue, log_level, log_sample))
+        process.start()
+        return process
+
+    children = [spawn() for _ in range(processes)]
+    log.info("supervisor_started", processes=processes, mode=mode, host=HOST, port=PORT)
+    try:
+        while True:
+            time.sleep(RESTART_DELAY)
+            for i, process in enumerate(children):
+                if not process.is_alive():
+                    log.warning("worker_restarting", pid=process.pid, exitcode=process.exitcode)
+                    children[i] = spawn()
+    except KeyboardInterrupt:
+        log.info("supervisor_stopping")
+    finally:
+        for process in children:
+            process.terminate()
+        for process in children:
+            process.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Movie Explorer request server")
+    parser.add_argument("--mode", choices=["threaded", "asyncio"], default="threaded",
+                        help="thread-per-connection or a single asyncio event loop")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="worker threads that run requests (per process)")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="pending requests allowed before new ones are rejected as busy")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="pre-fork this many worker processes sharing the port via SO_REUSEPORT")
+    parser.add_argument("--log-level", default=DEFAULT_LEVEL,
+                        help="DEBUG logs every request (subject to --log-sample)")
+    parser.add_argument("--log-sample", type=float, default=DEFAULT_SAMPLE_RATE,
+                        help="fraction of per-request log events to keep")
+    parser.add_argument("--store-durability", choices=DURABILITY_MODES, default="write_behind",
+                        help="persist users.json in the background or before acknowledging each write")
+    parser.add_argument("--store-flush-interval", type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help="seconds between write-behind snapshots of users.json")
+    parser.add_argument("--commit-window", type=float, default=DEFAULT_WINDOW * 1000,
+                        help="milliseconds a synchronous write waits for others to share its fsync")
+    parser.add_argument("--commit-max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                        help="most writes made durable by one fsync")
+    parser.add_argument("--storage", choices=BACKENDS, default="json",
+                        help="keep users, favorites and reviews in the JSON files or in SQLite")
+    parser.add_argument("--sqlite-path", default=SQLITE_DB,
+                        help="database file used by --storage sqlite")
+    parser.add_argument("--hash-processes", type=int, default=DEFAULT_PROCESSES,
+                        help="processes hashing and checking passwords (0 hashes on the request thread)")
+    parser.add_argument("--hash-max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="password hashes queued or running before logins are answered busy")
+    parser.add_argument("--search-cache-ttl", type=float, default=SEARCH_CACHE_TTL,
+                        help="seconds a search result is served from memory")
+    parser.add_argument("--search-cache-mb", type=float, default=SEARCH_CACHE_BYTES / 2 ** 20,
+                        help="memory cap of the search result cache")
+    parser.add_argument("--details-cache-mb", type=float, default=DETAILS_CACHE_BYTES / 2 ** 20,
+                        help="disk cap of the title details cache (db/details_cache.sqlite3)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    start_server()
+    args = parse_args()
+    configure_logging(args.log_level, args.log_sample)
+    # Pre-forked workers each hold a copy of the store, so they must share it through the file.
+    user_store.configure(args.store_flush_interval, args.store_durability, shared=args.processes > 1)
+    configure_storage(args.storage, args.sqlite_path)
+    configure_group_commit(args.commit_window / 1000, args.commit_max_batch)
+    password_hasher.configure(args.hash_processes, args.hash_max_pending)
+    search.configure_cache(args.search_cache_ttl, int(args.search_cache_mb * 2 ** 20),
+                           int(args.details_cache_mb * 2 ** 20))
+    if args.processes > 1:
+        # Each worker only hears about its own favorite changes; rebuild to see the others'.
+        favorites.recommender.configure(rebuild_interval=PREFORK_RECOMMENDER_REBUILD)
+        start_prefork_server(args.processes, args.mode, args.workers, args.max_queue,
+                             args.log_level, args.log_sample)
+    elif args.mode == "asyncio":
+        start_async_server(args.workers, args.max_queue)
+    else:
+        start_server(args.workers, args.max_queue)
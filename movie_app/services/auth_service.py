@@ -1,37 +1,62 @@
-import os
-import json
+import hmac
 import uuid
+from .log import get_logger
+from .password_hashing import DUMMY_HASH, HasherBusy, is_hashed, password_hasher
+from . import storage
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-USER_DB = os.path.join(BASE_DIR, "..", "db", "users.json")
+log = get_logger("auth")
 
 
 class AuthService:
-    def __init__(self):
-        if not os.path.exists(USER_DB):
-            with open(USER_DB, "w") as f:
-                json.dump({}, f)
+    def __init__(self, store=None, hasher=None):
+        self._store = store
+        self.hasher = hasher or password_hasher
+
+    @property
+    def store(self):
+        return self._store or storage.user_backend()
 
     def create_account(self, data):
         username = data.get("username")
         password = data.get("password")
-        with open(USER_DB, "r+") as f:
-            users = json.load(f)
-            if username in users:
-                return {"status": "fail", "message": "Username already exists"}
-            user_id = str(uuid.uuid4())
-            users[username] = {"password": password, "id": user_id}
-            f.seek(0)
-            f.truncate()
-            json.dump(users, f)
+        if not username or not isinstance(password, str) or not password:
+            return {"status": "fail", "message": "Username and password are required"}
+        user_id = str(uuid.uuid4())
+        if self.store.get_user(username) is not None:
+            return {"status": "fail", "message": "Username already exists"}
+        try:
+            hashed = self.hasher.hash(password)
+        except HasherBusy as e:
+            return e.response()
+        if not self.store.create_user(username, {"password": hashed, "id": user_id}):
+            return {"status": "fail", "message": "Username already exists"}
+        log.info("account_created", username=username)
         return {"status": "success", "message": "Account created", "user_id": user_id}
 
     def authenticate(self, data):
         username = data.get("username")
         password = data.get("password")
-        with open(USER_DB, "r") as f:
-            users = json.load(f)
-        user_info = users.get(username)
-        if user_info and user_info.get("password") == password:
-            return {"status": "success", "message": "Login successful", "user_id": user_info["id"]}
+        user_info = self.store.get_user(username)
+        try:
+            if user_info is None:
+                # Hash anyway, or the quick reply would tell which usernames exist.
+                if isinstance(password, str):
+                    self.hasher.verify(password, DUMMY_HASH)
+            elif self._check_password(username, password, user_info.get("password")):
+                return {"status": "success", "message": "Login successful", "user_id": user_info["id"]}
+        except HasherBusy as e:
+            return e.response()
+        log.info("login_failed", username=username)
         return {"status": "fail", "message": "Invalid credentials"}
+
+    def _check_password(self, username, password, stored):
+        if not isinstance(password, str) or stored is None:
+            return False
+        if is_hashed(stored):
+            return self.hasher.verify(password, stored)
+        # Accounts created before hashing hold the plaintext; upgrade them on their first good login.
+        if not hmac.compare_digest(str(stored).encode(), password.encode()):
+            return False
+        if self.store.set_password(username, stored, self.hasher.hash(password)):
+            log.info("password_upgraded", username=username)
+        return True
@@ -1,22 +1,43 @@
-import json
-import os
+from . import storage
+from .review_format import MAX_RATING, MIN_RATING
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
 
-COMMENTS_DB = "db/comments.json"
 
 class CommentService:
-    def __init__(self):
-        if not os.path.exists(COMMENTS_DB):
-            with open(COMMENTS_DB, "w") as f:
-                json.dump({}, f)
+    def __init__(self, store=None):
+        self._store = store
+
+    @property
+    def store(self):
+        return self._store or storage.comment_backend()
 
     def add_review(self, data):
         username = data.get("username")
         movie_id = str(data.get("movie_id"))
         comment = data.get("comment")
-        with open(COMMENTS_DB, "r+") as f:
-            comments = json.load(f)
-            comments.setdefault(movie_id, [])
-            comments[movie_id].append({"user": username, "comment": comment})
-            f.seek(0)
-            json.dump(comments, f)
+        rating = data.get("rating")
+        if rating is not None and (not isinstance(rating, int) or not MIN_RATING <= rating <= MAX_RATING):
+            return {"status": "fail", "message": f"rating must be between {MIN_RATING} and {MAX_RATING}"}
+        self.store.add_review(movie_id, username, comment, rating)
         return {"status": "success", "message": "Review added"}
+
+    def get_reviews(self, data):
+        """One page of a movie's reviews, oldest first.
+
+        `cursor` is the `next_cursor` of the previous page (omit it for the first
+        page); it stays valid while new reviews are added.
+        """
+        movie_id = str(data.get("movie_id"))
+        cursor = data.get("cursor")
+        limit = data.get("limit", DEFAULT_PAGE_SIZE)
+        if cursor is not None and (not isinstance(cursor, int) or cursor < 0):
+            return {"status": "fail", "message": "Invalid cursor"}
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE:
+            return {"status": "fail", "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}
+
+        # One extra row tells us whether another page follows.
+        reviews = self.store.get_reviews(movie_id, after=cursor, limit=limit + 1)
+        next_cursor = reviews[limit - 1]["id"] if len(reviews) > limit else None
+        return {"status": "success", "reviews": reviews[:limit], "next_cursor": next_cursor}
@@ -0,0 +1,237 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from operator import itemgetter
+from .file_lock import locked
+from .group_commit import GroupCommit
+from .log import get_logger
+from .metrics import store_metrics
+from .per_process import background_thread
+from .review_format import convert, dump_reviews, encode_review, make_review, read_reviews, write_reviews
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REVIEWS_DB = os.path.join(BASE_DIR, "..", "db", "reviews.jsonl")
+# Where reviews lived before the versioned format; converted on first start.
+LEGACY_COMMENTS_DB = os.path.join(BASE_DIR, "..", "db", "comments.json")
+
+DEFAULT_COMPACT_BYTES = 4 * 1024 * 1024
+DEFAULT_COMPACT_INTERVAL = 5.0
+
+log = get_logger("comment_store")
+
+
+class JsonCommentStore:
+    """Reviews kept as a reviews.jsonl snapshot plus an append-only journal.
+
+    Both files hold review_format records. Every review is one JSON line appended to `<path>.journal`, so a write
+    costs the same however many reviews exist; add_review returns once a
+    group commit has fsynced the journal. Reads are served from
+    an in-memory per-movie index, built from the snapshot and the journal on
+    first use and kept up to date by reading whatever other processes appended
+    since (or reloaded, after another process compacts). A background thread folds the journal into the snapshot once it
+    grows past `compact_bytes`.
+
+    Each review carries an increasing "id". Journal entries whose id is already
+    in the snapshot are skipped, so a crash between writing the snapshot and
+    resetting the journal cannot duplicate reviews.
+    """
+
+    def __init__(self, path=REVIEWS_DB, compact_bytes=DEFAULT_COMPACT_BYTES,
+                 compact_interval=DEFAULT_COMPACT_INTERVAL, legacy_path=LEGACY_COMMENTS_DB):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_bytes = compact_bytes
+        self.compact_interval = compact_interval
+        self._reviews = None
+        self._last_id = 0
+        self._count = 0
+        self._offset = 0
+        self._journal_inode = None
+        self._append_file = None
+        self._compactions = 0
+        self._lock = threading.RLock()
+        self._compactor = background_thread(self._compact_loop, "comment-compactor")
+        self._compact_at_exit = False
+        self._group = GroupCommit(self._sync_journal, "comment-store")
+        if not os.path.exists(path):
+            self._create(legacy_path)
+
+    def _create(self, legacy_path):
+        with self._lock_file(exclusive=True):
+            if os.path.exists(self.path):
+                return
+            if legacy_path and os.path.exists(legacy_path):
+                count = convert([legacy_path, legacy_path + ".journal"], self.path)
+                log.info("reviews_migrated", source=legacy_path, path=self.path, reviews=count)
+            else:
+                write_reviews(self.path, [])
+
+    def _lock_file(self, exclusive):
+        return locked(self.journal_path, exclusive=exclusive)
+
+    def _load(self):
+        self._reviews = {}
+        self._last_id = 0
+        self._count = 0
+        with store_metrics.measure("comments.read"):
+            for record in read_reviews(self.path):
+                self._reviews.setdefault(record["movie_id"], []).append(record)
+                self._last_id = max(self._last_id, record["id"])
+                self._count += 1
+        self._offset = 0
+        self._journal_inode = None
+
+    def _catch_up(self, exclusive):
+        """Apply journal lines appended since the last read. Called with the file and store locks held."""
+        if self._reviews is None:
+            self._load()
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return
+        if self._journal_inode is not None and st.st_ino != self._journal_inode:
+            # Another process compacted: entries we had not read yet are now only in the snapshot.
+            self._load()
+        if st.st_ino != self._journal_inode:
+            # A journal we have not read before: replay it, skipping ids already loaded.
+            self._journal_inode = st.st_ino
+            self._offset = 0
+        if st.st_size <= self._offset:
+            return
+        with open(self.journal_path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(st.st_size - self._offset)
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        self._offset += end
+        if end < len(data) and exclusive:
+            # A torn line from a crashed writer; cut it off before appending after it.
+            os.truncate(self.journal_path, self._offset)
+
+    def _apply(self, record):
+        if record["id"] <= self._last_id:
+            return
+        self._reviews.setdefault(record["movie_id"], []).append(record)
+        self._last_id = record["id"]
+        self._count += 1
+
+    def _journal(self):
+        """Append handle on the current journal file, reopened if compaction replaced it."""
+        if self._append_file is not None and os.fstat(self._append_file.fileno()).st_ino != self._journal_inode:
+            self._append_file.close()
+            self._append_file = None
+        if self._append_file is None:
+            self._append_file = open(self.journal_path, "ab")
+            self._journal_inode = os.fstat(self._append_file.fileno()).st_ino
+        return self._append_file
+
+    def add_review(self, movie_id, username, text, rating=None):
+        with self._lock_file(exclusive=True), self._lock:
+            self._catch_up(exclusive=True)
+            record = make_review(self._last_id + 1, movie_id, username, text, time.time(), rating)
+            line = encode_review(record)
+            f = self._journal()
+            with store_metrics.measure("comments.write"):
+                f.write(line)
+                f.flush()
+            self._apply(record)
+            self._offset += len(line)
+        self._group.commit()
+        self._ensure_compactor()
+
+    def _sync_journal(self):
+        with self._lock:
+            if self._append_file is None:
+                return
+            # A duplicate descriptor stays valid even if compaction swaps the journal meanwhile.
+            fd = os.dup(self._append_file.fileno())
+        try:
+            with store_metrics.measure("comments.fsync"):
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def get_reviews(self, movie_id, after=None, limit=None):
+        """Reviews of `movie_id` with an id above `after`, oldest first, at most `limit` of them."""
+        with self._lock_file(exclusive=False), self._lock, store_metrics.measure("comments.read"):
+            self._catch_up(exclusive=False)
+            records = self._reviews.get(movie_id, [])
+            start = bisect.bisect_right(records, after, key=itemgetter("id")) if after is not None else 0
+            end = len(records) if limit is None else start + limit
+            return [dict(record) for record in records[start:end]]
+
+    def _ensure_compactor(self):
+        if not self._compact_at_exit:
+            atexit.register(self._compact_if_needed)
+            self._compact_at_exit = True
+        self._compactor.get()
+
+    def _compact_loop(self):
+        while True:
+            time.sleep(self.compact_interval)
+            try:
+                self._compact_if_needed()
+            except OSError as e:
+                log.error("comment_compaction_failed", path=self.path, error=str(e))
+
+    def _compact_if_needed(self):
+        try:
+            if os.path.getsize(self.journal_path) >= self.compact_bytes:
+                self.compact()
+        except FileNotFoundError:
+            pass
+
+    def compact(self):
+        """Fold the journal into the snapshot.
+
+        Only the cut point is taken under the locks; the snapshot is serialised
+        and written while writers keep appending, then the entries appended in
+        the meantime are carried over into a fresh journal.
+        """
+        with self._lock_file(exclusive=True), self._lock:
+            self._catch_up(exclusive=True)
+            inode, offset = self._journal_inode, self._offset
+            if inode is None:
+                return False
+            # Review lists only ever grow, so their current lengths pin down this snapshot.
+            cut = {movie_id: len(records) for movie_id, records in self._reviews.items()}
+            reviews = self._reviews
+        snapshot = (record for movie_id, n in cut.items() for record in reviews[movie_id][:n])
+        tmp_path = f"{self.path}.{os.getpid()}.compact"
+        with open(tmp_path, "wb") as f, store_metrics.measure("comments.compact"):
+            dump_reviews(f, snapshot)
+
+        with self._lock_file(exclusive=True), self._lock:
+            self._catch_up(exclusive=True)
+            if self._journal_inode != inode:
+                os.remove(tmp_path)  # another process compacted first
+                return False
+            with open(self.journal_path, "rb") as f:
+                f.seek(offset)
+                tail = f.read(self._offset - offset)
+            os.replace(tmp_path, self.path)
+            with open(self.journal_path + ".tmp", "wb") as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.journal_path + ".tmp", self.journal_path)
+            self._offset = len(tail)
+            self._journal_inode = os.stat(self.journal_path).st_ino
+            self._compactions += 1
+        log.info("comments_compacted", reviews=self._count, carried_over=len(tail))
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "json",
+                "reviews": self._count if self._reviews is not None else None,
+                "journal_bytes": self._offset,
+                "compactions": self._compactions,
+                "compact_bytes": self.compact_bytes,
+                "group_commit": self._group.stats(),
+            }
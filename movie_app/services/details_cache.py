@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from .log import get_logger
+from .per_process import PerProcess
+
+log = get_logger("details_cache")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DETAILS_CACHE_DB = os.path.join(BASE_DIR, "..", "db", "details_cache.sqlite3")
+# Younger than this, an entry is served as is.
+DETAILS_FRESH_TTL = 24 * 3600
+# Up to this age it is still served, but refreshed in the background; older ones are fetched first.
+DETAILS_MAX_STALE = 30 * 24 * 3600
+DETAILS_CACHE_BYTES = 64 * 1024 * 1024
+# Eviction deletes least recently used entries until the cache is back under this share of the cap.
+EVICT_TO = 0.9
+# Reads record their time at most this often per entry, so hot entries do not turn every read into a write.
+TOUCH_INTERVAL = 60
+REFRESH_WORKERS = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS details (
+    title_id TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS details_by_last_used ON details(last_used);
+"""
+
+
+def encode_details(details):
+    return zlib.compress(json.dumps(details, separators=(",", ":")).encode())
+
+
+def decode_details(body):
+    return json.loads(zlib.decompress(body))
+
+
+class DetailsCache:
+    """Title details by id in a SQLite file, kept across restarts.
+
+    Bodies are stored as zlib-compressed compact JSON. Entries younger than
+    `fresh_ttl` are served directly; older ones up to `max_stale` are served
+    at once while a background thread fetches a new copy (stale-while-
+    revalidate), and are also served when a fetch fails. Past `max_bytes` the
+    least recently used entries are evicted. `fetch(title_id, timeout)` returns
+    the details dict, or None when they could not be fetched (never cached).
+    """
+
+    def __init__(self, fetch, path=DETAILS_CACHE_DB, fresh_ttl=DETAILS_FRESH_TTL, max_stale=DETAILS_MAX_STALE,
+                 max_bytes=DETAILS_CACHE_BYTES):
+        self.fetch = fetch
+        self.path = path
+        self.fresh_ttl = fresh_ttl
+        self.max_stale = max_stale
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refresh_pool = PerProcess(lambda: ThreadPoolExecutor(REFRESH_WORKERS, thread_name_prefix="details-refresh"))
+        self._bytes = None  # running total of stored sizes, seeded on the first put
+        self._counts = {"hits": 0, "stale_hits": 0, "misses": 0, "stale_on_error": 0,
+                        "refreshes": 0, "refresh_failures": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        # Opened on first use in each thread, and again in a pre-forked child.
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, title_id, timeout=10):
+        """The details of `title_id`, or None if they are neither cached nor fetchable."""
+        key = str(title_id)
+        conn = self._conn()
+        row = conn.execute("SELECT fetched_at, last_used, body FROM details WHERE title_id = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None:
+            fetched_at, last_used, body = row
+            if now - last_used >= TOUCH_INTERVAL:
+                conn.execute("UPDATE details SET last_used = ? WHERE title_id = ?", (now, key))
+            age = now - fetched_at
+            if age < self.fresh_ttl:
+                self._count("hits")
+                return decode_details(body)
+            if age < self.max_stale:
+                self._count("stale_hits")
+                self._refresh_later(key)
+                return decode_details(body)
+        self._count("misses")
+        details = self._fetch_and_store(key, timeout)
+        if details is None and row is not None:
+            self._count("stale_on_error")
+            return decode_details(row[2])
+        return details
+
+    def _fetch_and_store(self, key, timeout):
+        details = self.fetch(key, timeout)
+        if details is not None:
+            self.put(key, details)
+        return details
+
+    def put(self, title_id, details):
+        key = str(title_id)
+        body = encode_details(details)
+        now = time.time()
+        conn = self._conn()
+        old = conn.execute("SELECT size FROM details WHERE title_id = ?", (key,)).fetchone()
+        conn.execute("INSERT OR REPLACE INTO details (title_id, fetched_at, last_used, size, body) VALUES (?, ?, ?, ?, ?)",
+                     (key, now, now, len(body), sqlite3.Binary(body)))
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._stored_bytes(conn)
+            else:
+                self._bytes += len(body) - (old[0] if old else 0)
+            over = self._bytes > self.max_bytes
+        if over:
+            self._evict(conn)
+
+    def _stored_bytes(self, conn):
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM details").fetchone()[0]
+
+    def _evict(self, conn):
+        # The running total misses other workers' writes, so recount before deleting anything.
+        total = self._stored_bytes(conn)
+        if total <= self.max_bytes:
+            with self._lock:
+                self._bytes = total
+            return
+        target = total - int(self.max_bytes * EVICT_TO)
+        victims = []
+        freed = 0
+        for title_id, size in conn.execute("SELECT title_id, size FROM details ORDER BY last_used"):
+            if freed >= target:
+                break
+            victims.append((title_id,))
+            freed += size
+        conn.executemany("DELETE FROM details WHERE title_id = ?", victims)
+        with self._lock:
+            self._bytes = total - freed
+            self._counts["evictions"] += len(victims)
+        log.info("details_cache_evicted", entries=len(victims), bytes_before=total)
+
+    def _refresh_later(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresh_pool.get().submit(self._refresh, key)
+
+    def _refresh(self, key):
+        try:
+            details = self._fetch_and_store(key, 10)
+            self._count("refreshes" if details is not None else "refresh_failures")
+        except Exception as e:
+            self._count("refresh_failures")
+            log.error("details_refresh_failed", title_id=key, error=str(e))
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        entries, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM details").fetchone()
+        with self._lock:
+            return {"entries": entries, "bytes": size, "max_bytes": self.max_bytes,
+                    "refreshing": len(self._refreshing), **self._counts}
@@ -0,0 +1,137 @@
+import heapq
+import threading
+
+
+class IndexedMaxHeap:
+    """Binary max-heap of keys by integer count, with a position map so any key's
+    count can change in O(log n) and the top n can be read without a full sort."""
+
+    def __init__(self):
+        self._heap = []      # [count, key] pairs
+        self._position = {}  # key -> index in _heap
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._position[heap[i][1]] = i
+        self._position[heap[j][1]] = j
+
+    def _sift_up(self, i):
+        heap = self._heap
+        while i > 0:
+            parent = (i - 1) // 2
+            if heap[parent][0] >= heap[i][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        heap = self._heap
+        while True:
+            largest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap) and heap[child][0] > heap[largest][0]:
+                    largest = child
+            if largest == i:
+                return
+            self._swap(i, largest)
+            i = largest
+
+    def set(self, key, count):
+        """Set `key`'s count; a count of 0 removes it."""
+        i = self._position.get(key)
+        if i is None:
+            if count > 0:
+                self._heap.append([count, key])
+                self._position[key] = len(self._heap) - 1
+                self._sift_up(len(self._heap) - 1)
+            return
+        if count <= 0:
+            last = len(self._heap) - 1
+            self._swap(i, last)
+            self._heap.pop()
+            del self._position[key]
+            if i < last:
+                self._sift_up(i)
+                self._sift_down(i)
+            return
+        old = self._heap[i][0]
+        self._heap[i][0] = count
+        if count > old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def top(self, n):
+        """The n highest (key, count) pairs, highest first, in O(n log n)."""
+        heap = self._heap
+        result = []
+        # Best-first walk from the root: the next largest is always a child of one already taken.
+        frontier = [(-heap[0][0], 0)] if heap else []
+        while frontier and len(result) < n:
+            _, i = heapq.heappop(frontier)
+            result.append((heap[i][1], heap[i][0]))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (-heap[child][0], child))
+        return result
+
+
+class FavoriteIndex:
+    """Movie -> users who favorited it, plus a heap of movies by favorite count.
+
+    Movie ids are normalised with str(), since favorites hold both ints and
+    strings for the same title. Safe to update from any thread.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._heap = IndexedMaxHeap()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, users):
+        """Index every favorite in a {username: {"favorites": [...]}} dict."""
+        index = cls()
+        for username, record in users.items():
+            for movie_id in record.get("favorites", []):
+                index._users.setdefault(str(movie_id), set()).add(username)
+        for movie_id, fans in index._users.items():
+            index._heap.set(movie_id, len(fans))
+        return index
+
+    def add(self, movie_id, username):
+        movie_id = str(movie_id)
+        with self._lock:
+            fans = self._users.setdefault(movie_id, set())
+            fans.add(username)
+            self._heap.set(movie_id, len(fans))
+
+    def remove(self, movie_id, username):
+        movie_id = str(movie_id)
+        with self._lock:
+            fans = self._users.get(movie_id)
+            if fans is None:
+                return
+            fans.discard(username)
+            if not fans:
+                del self._users[movie_id]
+            self._heap.set(movie_id, len(fans))
+
+    def count(self, movie_id):
+        with self._lock:
+            return len(self._users.get(str(movie_id), ()))
+
+    def users(self, movie_id):
+        with self._lock:
+            return sorted(self._users.get(str(movie_id), ()))
+
+    def top(self, n):
+        with self._lock:
+            return self._heap.top(n)
+
+    def __len__(self):
+        return len(self._users)
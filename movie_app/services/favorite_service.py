@@ -1,35 +1,31 @@
-import json
-import os
+from . import storage
+from .recommender import Recommender
 
-USERS_DB = "db/users.json"
+DEFAULT_TOP_FAVORITES = 10
+MAX_TOP_FAVORITES = 100
+DEFAULT_RECOMMENDATIONS = 10
+MAX_RECOMMENDATIONS = 50
 
 class FavoriteService:
-    def __init__(self):
-        if not os.path.exists(USERS_DB):
-            with open(USERS_DB, "w") as f:
-                json.dump({}, f)
+    def __init__(self, store=None):
+        self._store = store
+        self.recommender = Recommender(lambda: self.store.all_favorites())
+
+    @property
+    def store(self):
+        return self._store or storage.user_backend()
 
     def add_to_favorites(self, data):
         """Add a movie to the user's favorites."""
         username = data.get("username")
         movie_id = data.get("movie_id")
 
-        with open(USERS_DB, "r+") as f:
-            users = json.load(f)
-            if username not in users:
-                return {"status": "fail", "message": "User not found"}
-
-            user = users[username]
-            favorites = user.get("favorites", [])
-
-            if movie_id in favorites:
-                return {"status": "fail", "message": "Movie already in favorites"}
-            favorites.append(movie_id)
-            user["favorites"] = favorites  # Update the user's favorites list
-
-            f.seek(0)
-            json.dump(users, f)
-
+        added = self.store.add_favorite(username, movie_id)
+        if added is None:
+            return {"status": "fail", "message": "User not found"}
+        if not added:
+            return {"status": "fail", "message": "Movie already in favorites"}
+        self.recommender.favorite_changed(username, movie_id, added=True)
         return {"status": "success", "message": "Added to favorites"}
 
     def remove_from_favorites(self, data):
@@ -37,32 +33,48 @@ class FavoriteService:
         username = data.get("username")
         movie_id = data.get("movie_id")
 
-        # Load the users' data from the file
-        with open(USERS_DB, "r+") as f:
-            users = json.load(f)
-
-            if username not in users:
-                return {"status": "fail", "message": "User not found"}
-            user = users[username]
-            favorites = user.get("favorites", [])
-
-            if movie_id not in favorites:
-                return {"status": "fail", "message": "Movie not in favorites"}
-
-            favorites.remove(movie_id)
-            user["favorites"] = favorites  # Update the user's favorites list
-
-            f.seek(0)
-            json.dump(users, f)
-
+        removed = self.store.remove_favorite(username, movie_id)
+        if removed is None:
+            return {"status": "fail", "message": "User not found"}
+        if not removed:
+            return {"status": "fail", "message": "Movie not in favorites"}
+        self.recommender.favorite_changed(username, movie_id, added=False)
         return {"status": "success", "message": "Removed from favorites"}
 
     def get_user_favorites(self, username):
-        """Get the list of favorite movie IDs for a user."""    
-        with open(USERS_DB, "r") as f:
-            users = json.load(f)
-
-            if username not in users:
-                return {"status": "fail", "message": "User not found"}
-
-            return {"status": "success", "favorites": users[username].get("favorites", [])}
+        """Get the list of favorite movie IDs for a user."""
+        favorites = self.store.get_favorites(username)
+        if favorites is None:
+            return {"status": "fail", "message": "User not found"}
+        return {"status": "success", "favorites": favorites}
+
+    def get_favorites(self, data):
+        """The `get_favorites` action: the user's favorite movie IDs."""
+        return self.get_user_favorites(data.get("username"))
+
+    def movie_favorite_count(self, data):
+        """How many users have favorited a movie."""
+        movie_id = data.get("movie_id")
+        if movie_id is None:
+            return {"status": "fail", "message": "movie_id is required"}
+        return {"status": "success", "movie_id": str(movie_id), "count": self.store.favorite_count(movie_id)}
+
+    def top_favorites(self, data):
+        """The most favorited movies, most favorited first."""
+        limit = data.get("limit", DEFAULT_TOP_FAVORITES)
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_TOP_FAVORITES:
+            return {"status": "fail", "message": f"limit must be between 1 and {MAX_TOP_FAVORITES}"}
+        movies = [{"movie_id": movie_id, "count": count} for movie_id, count in self.store.top_favorites(limit)]
+        return {"status": "success", "movies": movies}
+
+    def recommendations(self, data):
+        """Movies the user has not favorited yet, ranked by similarity to the ones they have."""
+        username = data.get("username")
+        limit = data.get("limit", DEFAULT_RECOMMENDATIONS)
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_RECOMMENDATIONS:
+            return {"status": "fail", "message": f"limit must be between 1 and {MAX_RECOMMENDATIONS}"}
+        if self.store.get_favorites(username) is None:
+            return {"status": "fail", "message": "User not found"}
+        movies = [{"movie_id": movie_id, "score": score}
+                  for movie_id, score in self.recommender.recommend(username, limit)]
+        return {"status": "success", "recommendations": movies}
@@ -0,0 +1,22 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, only the single-process server is safe there
+    fcntl = None
+
+
+@contextmanager
+def locked(path, exclusive=True):
+    """Hold an advisory lock on `path` across processes (e.g. pre-forked server workers).
+
+    The lock lives in a sidecar `<path>.lock` file so rewriting `path` itself never drops it.
+    """
+    with open(path + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+from .metrics import LatencyHistogram
+from .per_process import background_thread
+
+# With no window, writers that arrive while one persist() runs share the next one.
+DEFAULT_WINDOW = 0.0
+DEFAULT_MAX_BATCH = 64
+
+# Process-wide tuning, read on every batch so server flags apply to stores created earlier.
+window = DEFAULT_WINDOW
+max_batch = DEFAULT_MAX_BATCH
+
+
+def configure_group_commit(commit_window=DEFAULT_WINDOW, commit_max_batch=DEFAULT_MAX_BATCH):
+    global window, max_batch
+    if commit_window < 0 or commit_max_batch < 1:
+        raise ValueError("commit window must be >= 0 and max batch >= 1")
+    window = commit_window
+    max_batch = commit_max_batch
+
+
+class _Batch:
+    def __init__(self):
+        self.size = 0
+        self.opened = time.monotonic()
+        self.done = threading.Event()
+        self.error = None
+
+
+class GroupCommit:
+    """Makes many concurrent writers durable with one `persist()` call.
+
+    A writer applies its change in memory, then calls commit(), which blocks
+    until a persist() that started after the change has finished. The first
+    waiter opens a batch; the batch closes `window` seconds later, or as soon
+    as `max_batch` writers have joined (later writers open the next batch),
+    and a background thread runs persist() once for all of them. If persist() raises, every writer in that batch gets
+    the exception.
+    """
+
+    def __init__(self, persist, name):
+        self.persist = persist
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._thread = background_thread(self._run, f"{name}-group-commit")
+        self._batches = 0
+        self._commits = 0
+        self._batch_sizes = LatencyHistogram()  # its log-linear buckets work for any integer
+
+    def commit(self):
+        with self._cond:
+            self._thread.get()
+            if not self._pending or self._pending[-1].size >= max_batch:
+                self._pending.append(_Batch())
+            batch = self._pending[-1]
+            batch.size += 1
+            self._cond.notify()
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            batch = self._pending[0]
+            while batch.size < max_batch:
+                remaining = batch.opened + window - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            # Writers joining from here on go into a new batch.
+            self._pending.popleft()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.persist()
+            except Exception as e:
+                batch.error = e
+            with self._cond:
+                self._batches += 1
+                self._commits += batch.size
+                self._batch_sizes.record(batch.size)
+            batch.done.set()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "window_ms": window * 1000,
+                "max_batch": max_batch,
+                "batches": self._batches,
+                "commits": self._commits,
+                "mean_batch": round(self._commits / self._batches, 2) if self._batches else None,
+                "p99_batch": self._batch_sizes.percentile(99),
+                "max_batch_seen": self._batch_sizes.max,
+            }
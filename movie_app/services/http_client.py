@@ -0,0 +1,137 @@
+import email.utils
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .log import get_logger
+from .per_process import PerProcess
+
+log = get_logger("http")
+
+# Connections kept open per host; callers beyond this wait for a free one rather than opening more.
+DEFAULT_POOL_SIZE = 16
+# Hosts whose pools are kept (Watchmode's API plus the image CDNs posters come from).
+DEFAULT_MAX_HOSTS = 8
+DEFAULT_RETRIES = 2
+# Retry n sleeps a random time up to min(backoff_cap, backoff * 2**n) ("full jitter").
+DEFAULT_BACKOFF = 0.2
+DEFAULT_BACKOFF_CAP = 2.0
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def _retry_after(response):
+    """Seconds asked for by a Retry-After header, or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """GETs over one shared requests.Session with keep-alive connection pools.
+
+    Reusing connections saves a TCP and TLS handshake on all but the first
+    request to a host. The urllib3 pools behind the session are thread-safe,
+    so every worker thread shares them; at most `pool_size` connections are
+    open per host. Connection failures and 429/502/503/504 replies are retried
+    up to `retries` times with jittered exponential backoff (honouring
+    Retry-After), which only suits idempotent requests, hence GET only.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, max_hosts=DEFAULT_MAX_HOSTS, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, backoff_cap=DEFAULT_BACKOFF_CAP):
+        self.pool_size = pool_size
+        self.max_hosts = max_hosts
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+        # Sockets must not be shared across processes, so a pre-forked worker opens its own.
+        self._session = PerProcess(self._new_session)
+        self._requests = 0
+        self._retries = 0
+        self._failures = 0
+        self._lock = threading.Lock()
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_hosts, pool_maxsize=self.pool_size,
+                              pool_block=True, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_cap, self.backoff * 2 ** attempt))
+
+    def get(self, url, params=None, timeout=10):
+        """requests.get through the shared pools, retried as described above."""
+        session = self._session.get()
+        with self._lock:
+            self._requests += 1
+        attempt = 0
+        while True:
+            try:
+                response = session.get(url, params=params, timeout=timeout)
+            except requests.ConnectionError as e:
+                # Includes connect timeouts and keep-alive connections the server had already closed;
+                # read timeouts are not retried, since the caller's timeout would then be exceeded.
+                if attempt >= self.retries:
+                    self._count_failure()
+                    raise
+                delay = self._backoff(attempt)
+                log.info("http_retry", sampled=True, url=url, attempt=attempt + 1, error=str(e))
+            except requests.RequestException:
+                self._count_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                asked = _retry_after(response)
+                delay = self._backoff(attempt) if asked is None else asked
+                if delay > self.backoff_cap:
+                    return response  # the server wants a longer pause than a caller should sit through
+                response.close()
+                log.info("http_retry", sampled=True, url=url, attempt=attempt + 1, status=response.status_code)
+            with self._lock:
+                self._retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def _count_failure(self):
+        with self._lock:
+            self._failures += 1
+
+    def close(self):
+        session = self._session.discard()
+        if session is not None:
+            session.close()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "requests": self._requests,
+                "retries": self._retries,
+                "failures": self._failures,
+                "pool_size": self.pool_size,
+            }
+        session = self._session.peek()
+        if session is not None:
+            pools = session.get_adapter("https://").poolmanager.pools
+            opened = 0
+            for key in pools.keys():
+                pool = pools.get(key)  # may have been dropped since keys() was taken
+                opened += pool.num_connections if pool is not None else 0
+            stats["connections_opened"] = opened
+        return stats
+
+
+# Shared by the server's services and the GUI clients.
+upstream = HttpClient()
@@ -0,0 +1,124 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+DEFAULT_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Fraction of high-volume events (one per request or per search result) that are kept.
+DEFAULT_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+QUEUE_SIZE = 10000
+REDACTED = "***"
+REDACT_KEYS = {"password", "apikey", "api_key", "token", "secret"}
+
+ROOT_LOGGER = "movie_app"
+_listener = None
+sample_rate = DEFAULT_SAMPLE_RATE
+
+
+def redact(value):
+    """Copy of `value` with secrets under any REDACT_KEYS key replaced, at any depth."""
+    if isinstance(value, dict):
+        return {k: REDACTED if str(k).lower() in REDACT_KEYS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event, then the event's fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+            "pid": record.process,
+        }
+        entry.update(redact(getattr(record, "fields", {})))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the writer falls behind."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Formatting (and redaction) happens on the listener thread, not the request thread.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class EventLogger:
+    """Thin wrapper over a stdlib logger that logs named events with structured fields."""
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def log(self, level, event, sampled=False, exc_info=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if sampled and sample_rate < 1.0 and random.random() >= sample_rate:
+            return
+        self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event, **fields):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(logging.ERROR, event, **fields)
+
+
+def get_logger(name):
+    return EventLogger(name)
+
+
+def configure_logging(level=DEFAULT_LEVEL, sample=DEFAULT_SAMPLE_RATE, stream=None):
+    """Route all movie_app loggers through a bounded queue to a background JSON writer.
+
+    Safe to call again (e.g. in a freshly forked worker): the previous writer is stopped first.
+    """
+    global _listener, sample_rate
+    if _listener is None:
+        atexit.register(_stop_listener)
+    else:
+        _listener.stop()
+    sample_rate = sample
+
+    log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers = [DroppingQueueHandler(log_queue)]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.propagate = False
+    return root
+
+
+def _stop_listener():
+    """Flush everything already queued, then stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
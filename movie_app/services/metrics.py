@@ -0,0 +1,135 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# HDR-style log-linear buckets: values below 2**SUB_BUCKET_BITS get their own bucket,
+# above that every power of two is split into 2**(SUB_BUCKET_BITS - 1) buckets,
+# which bounds the relative error of any reported value to about 3%.
+SUB_BUCKET_BITS = 6
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+
+def bucket_index(value):
+    value = max(0, int(value))
+    shift = max(0, value.bit_length() - SUB_BUCKET_BITS)
+    return shift * SUB_BUCKET_HALF + (value >> shift)
+
+
+def bucket_upper_bound(index):
+    shift = max(0, index // SUB_BUCKET_HALF - 1)
+    mantissa = index - shift * SUB_BUCKET_HALF
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Fixed-precision histogram of latencies recorded in microseconds."""
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def record(self, micros):
+        index = bucket_index(micros)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += micros
+        self.max = max(self.max, micros)
+
+    def percentile(self, p):
+        """Highest value equivalent to the p-th percentile (HDR semantics), in microseconds."""
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(p / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(bucket_upper_bound(index), self.max)
+        return self.max
+
+
+class ActionMetrics:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.histogram = LatencyHistogram()
+
+    def snapshot(self):
+        hist = self.histogram
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(hist.sum / hist.total / 1000, 3) if hist.total else 0,
+            "p50_ms": hist.percentile(50) / 1000,
+            "p95_ms": hist.percentile(95) / 1000,
+            "p99_ms": hist.percentile(99) / 1000,
+            "max_ms": hist.max / 1000,
+        }
+
+
+class MetricsRegistry:
+    """Per-action call counts, error counts and latency histograms, safe to update from any thread."""
+
+    def __init__(self):
+        self._actions = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, error=False):
+        with self._lock:
+            metrics = self._actions.get(name)
+            if metrics is None:
+                metrics = self._actions[name] = ActionMetrics()
+            metrics.count += 1
+            if error:
+                metrics.errors += 1
+            metrics.histogram.record(int(seconds * 1_000_000))
+
+    def timed(self, name, fn, *args, **kwargs):
+        """Call fn and record its latency; raised exceptions and error responses count as errors."""
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record(name, time.perf_counter() - started, error=True)
+            raise
+        is_error = isinstance(result, dict) and result.get("status") == "error"
+        self.record(name, time.perf_counter() - started, error=is_error)
+        return result
+
+    @contextmanager
+    def measure(self, name):
+        """Record the latency of a `with` block; an exception escaping it counts as an error."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record(name, time.perf_counter() - started, error=True)
+            raise
+        self.record(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: metrics.snapshot() for name, metrics in self._actions.items()}
+
+
+class Counters:
+    """Named integer counters and gauges that any thread can bump."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+# Read/write timings of the JSON files behind the services, shared by every service instance.
+store_metrics = MetricsRegistry()
@@ -0,0 +1,156 @@
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .per_process import PerProcess
+
+SCHEME = "scrypt"
+# About 16 MB and ~50-150 ms per hash: slow enough to resist guessing, fast enough for a login.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+DEFAULT_PROCESSES = 2
+# Hash workers run at a lower priority, so request threads win the CPU when cores are scarce.
+WORKER_NICENESS = 10
+# Each pending hash holds a request worker while it waits, so keep this well below --workers.
+DEFAULT_MAX_PENDING = 8
+
+
+class HasherBusy(Exception):
+    """Raised when `max_pending` hashes are already queued or running."""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many logins in progress, retry shortly")
+        self.retry_after = retry_after
+
+    def response(self):
+        return {"status": "busy", "message": str(self), "retry_after": self.retry_after}
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p)
+
+
+def hash_password(password):
+    """Return a self-describing "scrypt$n$r$p$salt$hash" string. Runs in a pool process."""
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(digest)}"
+
+
+# Checked against when a login names no existing user, so that costs as much as a wrong password.
+DUMMY_HASH = f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(bytes(SALT_BYTES))}${_b64(bytes(64))}"
+
+
+def verify_password(password, stored):
+    """Check `password` against a string from hash_password. Runs in a pool process."""
+    _, n, r, p, salt, digest = stored.split("$")
+    candidate = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(candidate, base64.b64decode(digest))
+
+
+def _lower_priority():
+    try:
+        os.nice(WORKER_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(SCHEME + "$")
+
+
+class PasswordHasher:
+    """Runs hash_password / verify_password in a pool of worker processes.
+
+    A KDF keeps a CPU busy for the whole hash, so running it on request
+    threads would starve everything else of the GIL. At most `max_pending`
+    hashes may be queued or running; beyond that HasherBusy is raised instead
+    of building an ever longer queue. `processes=0` hashes on the calling
+    thread (used by the benchmark for comparison).
+    """
+
+    def __init__(self, processes=DEFAULT_PROCESSES, max_pending=DEFAULT_MAX_PENDING):
+        self.processes = processes
+        self.max_pending = max_pending
+        self._pool = PerProcess(self._new_pool)
+        self._pending = 0
+        self._rejected = 0
+        self._hash_seconds = 0.1  # moving average, for retry_after
+        self._lock = threading.Lock()
+
+    def configure(self, processes=None, max_pending=None):
+        with self._lock:
+            if processes is not None:
+                self.processes = processes
+            if max_pending is not None:
+                self.max_pending = max_pending
+            self._shutdown()
+
+    def _new_pool(self):
+        # spawn, not fork: forking a process that already runs threads can copy held locks.
+        return ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_lower_priority)
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HasherBusy(round(self._hash_seconds * max(self._pending, 1) / max(self.processes, 1), 3))
+            self._pending += 1
+            # A daemonic process (such as a worker someone else started) cannot have children.
+            inline = not self.processes or multiprocessing.current_process().daemon
+            executor = None if inline else self._pool.get()
+        started = time.monotonic()
+        try:
+            if executor is None:
+                return fn(*args)
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._pool.discard(executor)  # a worker died; start a fresh pool next time
+            raise
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._pending -= 1
+                self._hash_seconds += 0.2 * (elapsed - self._hash_seconds)
+
+    def hash(self, password):
+        return self._run(hash_password, password)
+
+    def verify(self, password, stored):
+        return self._run(verify_password, password, stored)
+
+    def close(self):
+        """Stop this process's hashing workers, letting hashes in progress finish."""
+        pool = self._pool.discard()
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _shutdown(self):
+        pool = self._pool.discard()
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scheme": SCHEME,
+                "processes": self.processes,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "rejected": self._rejected,
+            }
+
+
+password_hasher = PasswordHasher()
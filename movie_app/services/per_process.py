@@ -0,0 +1,58 @@
+import os
+import threading
+
+
+class PerProcess:
+    """An object created on first use in each process, such as a pool or a background thread.
+
+    Threads, sockets and worker pools do not carry over a fork, so a
+    pre-forked server worker must not use the ones its parent made. get()
+    calls `factory()` the first time it runs in a process, and again when
+    `alive(obj)` is given and returns False (a background thread that died).
+    """
+
+    def __init__(self, factory, alive=None):
+        self.factory = factory
+        self.alive = alive
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _usable(self, value, pid):
+        return value is not None and pid == os.getpid() and (self.alive is None or self.alive(value))
+
+    def get(self):
+        value, pid = self._value, self._pid
+        if self._usable(value, pid):
+            return value
+        with self._lock:
+            if not self._usable(self._value, self._pid):
+                self._value = self.factory()
+                self._pid = os.getpid()
+            return self._value
+
+    def peek(self):
+        """This process's object, or None if it has not made one."""
+        with self._lock:
+            return self._value if self._pid == os.getpid() else None
+
+    def discard(self, value=None):
+        """Forget the object so the next get() makes a new one, and return it if it is this process's.
+
+        With `value`, only forgets it if it is still the current object.
+        """
+        with self._lock:
+            if value is not None and value is not self._value:
+                return None
+            current = self._value if self._pid == os.getpid() else None
+            self._value = None
+            return current
+
+
+def background_thread(target, name):
+    """A PerProcess daemon thread running `target`, started on first get() and restarted if it stops."""
+    def start():
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        return thread
+    return PerProcess(start, alive=threading.Thread.is_alive)
@@ -0,0 +1,259 @@
+import threading
+import time
+import numpy as np
+from .log import get_logger
+from .per_process import background_thread
+
+DEFAULT_NEIGHBORS = 20
+DEFAULT_REFRESH_INTERVAL = 1.0
+# Past this share of dirty rows, one vectorised rebuild beats refreshing rows one by one.
+REBUILD_FRACTION = 0.25
+# Users with more favorites than this only contribute their first ones to similarities,
+# which bounds the pair expansion (it grows with the square of a user's favorites).
+MAX_USER_ITEMS = 500
+
+log = get_logger("recommender")
+
+
+class _Table:
+    """Everything one build produces; replaced as a whole, so readers never see a half-built table."""
+
+    def __init__(self, movies, neighbors, similarity):
+        self.movies = movies                                 # column index -> movie id
+        self.column = {m: i for i, m in enumerate(movies)}   # movie id -> column index
+        self.neighbors = neighbors                           # (movies, k) int32, -1 = empty slot
+        self.similarity = similarity                         # (movies, k) float32
+
+    def grow(self, movie_id, k):
+        """Give `movie_id` a column, enlarging the arrays geometrically when full."""
+        column = self.column.get(movie_id)
+        if column is not None:
+            return column
+        column = len(self.movies)
+        self.movies.append(movie_id)
+        self.column[movie_id] = column
+        if column >= len(self.neighbors):
+            size = max(16, 2 * len(self.neighbors))
+            neighbors = np.full((size, k), -1, dtype=np.int32)
+            similarity = np.zeros((size, k), dtype=np.float32)
+            neighbors[:column] = self.neighbors[:column]
+            similarity[:column] = self.similarity[:column]
+            self.neighbors, self.similarity = neighbors, similarity
+        return column
+
+
+def build_csr(favorites, columns):
+    """User-by-movie incidence matrix in CSR form: (indptr, indices), one row per user."""
+    lengths = np.fromiter((min(len(f), MAX_USER_ITEMS) for f in favorites), dtype=np.int64, count=len(favorites))
+    indptr = np.zeros(len(favorites) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.fromiter((columns[m] for f in favorites for m in f[:MAX_USER_ITEMS]),
+                          dtype=np.int32, count=int(indptr[-1]))
+    return indptr, indices
+
+
+def item_similarity_top_k(indptr, indices, n_movies, k):
+    """Cosine similarity between movies (co-favorites / sqrt(count_a * count_b)),
+    keeping the k most similar neighbours of each movie.
+
+    Every (a, b) co-favorite pair is generated with repeat/arange arithmetic on
+    the CSR arrays and counted with np.unique, so nothing loops in Python and
+    no dense movie-by-movie matrix is ever allocated.
+    """
+    neighbors = np.full((max(n_movies, 1), k), -1, dtype=np.int32)
+    similarity = np.zeros((max(n_movies, 1), k), dtype=np.float32)
+    lengths = np.diff(indptr)
+    if not len(indices):
+        return neighbors, similarity
+    # Entry e (a favorite of user u) pairs with each of u's lengths[u] favorites.
+    entry_user = np.repeat(np.arange(len(lengths)), lengths)
+    per_entry = lengths[entry_user]
+    left = np.repeat(indices, per_entry).astype(np.int64)
+    offsets = np.arange(per_entry.sum()) - np.repeat(np.cumsum(per_entry) - per_entry, per_entry)
+    right = indices[np.repeat(indptr[entry_user], per_entry) + offsets]
+    distinct = left != right
+    pairs, co_counts = np.unique(left[distinct] * n_movies + right[distinct], return_counts=True)
+    a, b = pairs // n_movies, pairs % n_movies
+
+    movie_counts = np.bincount(indices, minlength=n_movies)
+    scores = co_counts / np.sqrt(movie_counts[a] * movie_counts[b])
+    # Sort by movie, best neighbour first, then keep each movie's first k.
+    order = np.lexsort((-scores, a))
+    a, b, scores = a[order], b[order], scores[order]
+    rank = np.arange(len(a)) - np.searchsorted(a, a)
+    keep = rank < k
+    neighbors[a[keep], rank[keep]] = b[keep]
+    similarity[a[keep], rank[keep]] = scores[keep]
+    return neighbors, similarity
+
+
+class Recommender:
+    """Item-item "people who favorited this also favorited" recommendations.
+
+    A full build turns every user's favorites into a CSR matrix and computes
+    each movie's top-k most similar movies in one vectorised pass. A request
+    then only looks up the rows of the user's favorites in that table and adds
+    them up. Favorite changes mark the rows they affect as dirty; a background
+    thread recomputes just those rows every `refresh_interval` seconds (or
+    rebuilds everything when most rows are dirty). `rebuild_interval`, if set,
+    forces periodic full rebuilds to pick up writes made by other processes.
+    """
+
+    def __init__(self, source, k=DEFAULT_NEIGHBORS, refresh_interval=DEFAULT_REFRESH_INTERVAL, rebuild_interval=None):
+        self.source = source  # () -> {username: [movie_id, ...]}
+        self.k = k
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._table = None
+        self._user_movies = {}   # username -> set of columns
+        self._movie_users = {}   # column -> set of usernames
+        self._dirty = set()
+        self._during_build = None  # changes seen while a rebuild reads the store, replayed after it
+        self._built_at = 0
+        self._builds = 0
+        self._row_refreshes = 0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._refresher = background_thread(self._refresh_loop, "recommender-refresh")
+
+    def configure(self, rebuild_interval=None):
+        self.rebuild_interval = rebuild_interval
+
+    def _ensure_built(self):
+        if self._table is None:
+            self.rebuild()
+        self._refresher.get()
+
+    def rebuild(self):
+        """Recompute the whole table from the store."""
+        with self._build_lock:
+            started = time.perf_counter()
+            with self._lock:
+                self._during_build = []
+            try:
+                # dict.fromkeys drops duplicates such as 5 and "5" while keeping the order.
+                favorites = {user: list(dict.fromkeys(str(m) for m in movies))
+                             for user, movies in self.source().items()}
+            except Exception:
+                with self._lock:
+                    self._during_build = None
+                raise
+            movies = sorted({m for f in favorites.values() for m in f})
+            columns = {m: i for i, m in enumerate(movies)}
+            users = list(favorites)
+            indptr, indices = build_csr([favorites[u] for u in users], columns)
+            neighbors, similarity = item_similarity_top_k(indptr, indices, len(movies), self.k)
+
+            user_movies = {u: {columns[m] for m in favorites[u]} for u in users}
+            movie_users = {}
+            for user, cols in user_movies.items():
+                for column in cols:
+                    movie_users.setdefault(column, set()).add(user)
+            with self._lock:
+                self._table = _Table(movies, neighbors, similarity)
+                self._user_movies, self._movie_users = user_movies, movie_users
+                self._dirty.clear()
+                for change in self._during_build:
+                    self._apply(*change)
+                self._during_build = None
+                self._built_at = time.monotonic()
+                self._builds += 1
+        log.info("recommender_rebuilt", movies=len(movies), users=len(users), favorites=len(indices),
+                 ms=round((time.perf_counter() - started) * 1000, 1))
+
+    def favorite_changed(self, username, movie_id, added):
+        """Record one favorite change and mark the similarity rows it affects."""
+        with self._lock:
+            if self._during_build is not None:
+                self._during_build.append((username, str(movie_id), added))
+            elif self._table is not None:  # otherwise the first build will read it from the store
+                self._apply(username, str(movie_id), added)
+
+    def _apply(self, username, movie_id, added):
+        """Update the incidence sets and mark rows dirty. Called with the lock held."""
+        column = self._table.grow(movie_id, self.k)
+        movies = self._user_movies.setdefault(username, set())
+        fans = self._movie_users.setdefault(column, set())
+        if added:
+            movies.add(column)
+            fans.add(username)
+        else:
+            movies.discard(column)
+            fans.discard(username)
+        # The movie's own row changes, and so does its similarity to everything it co-occurs
+        # with (its favorite count is in every such score).
+        self._dirty.add(column)
+        for fan in fans | {username}:
+            self._dirty.update(self._user_movies.get(fan, ()))
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                if self.rebuild_interval and time.monotonic() - self._built_at >= self.rebuild_interval:
+                    self.rebuild()
+                else:
+                    self.refresh()
+            except Exception as e:
+                log.error("recommender_refresh_failed", error=str(e))
+
+    def refresh(self):
+        """Recompute the dirty rows of the table."""
+        with self._lock:
+            table = self._table
+            if table is None or not self._dirty:
+                return
+            if len(self._dirty) > REBUILD_FRACTION * len(table.movies):
+                rebuild = True
+            else:
+                rebuild = False
+                dirty, self._dirty = self._dirty, set()
+                for column in dirty:
+                    self._refresh_row(table, column)
+                self._row_refreshes += len(dirty)
+        if rebuild:
+            self.rebuild()
+
+    def _refresh_row(self, table, column):
+        """Recompute one movie's neighbours from the incidence sets. Called with the lock held."""
+        table.neighbors[column] = -1
+        table.similarity[column] = 0
+        fans = self._movie_users.get(column)
+        if not fans:
+            return
+        co_favorites = np.fromiter((c for fan in fans for c in self._user_movies[fan] if c != column), dtype=np.int64)
+        if not len(co_favorites):
+            return
+        others, co_counts = np.unique(co_favorites, return_counts=True)
+        counts = np.fromiter((len(self._movie_users[c]) for c in others), dtype=np.float64, count=len(others))
+        scores = co_counts / np.sqrt(len(fans) * counts)
+        best = np.argsort(-scores, kind="stable")[:self.k]
+        table.neighbors[column, :len(best)] = others[best]
+        table.similarity[column, :len(best)] = scores[best]
+
+    def recommend(self, username, n):
+        """[(movie_id, score), ...] for up to n movies the user has not favorited, best first."""
+        self._ensure_built()
+        with self._lock:
+            table = self._table
+            mine = np.fromiter(self._user_movies.get(username, ()), dtype=np.int64)
+            if not len(mine):
+                return []
+            neighbors = table.neighbors[mine].ravel()
+            similarity = table.similarity[mine].ravel()
+        found = (neighbors >= 0) & ~np.isin(neighbors, mine)
+        candidates, slots = np.unique(neighbors[found], return_inverse=True)
+        scores = np.bincount(slots, weights=similarity[found], minlength=len(candidates))
+        best = np.argsort(-scores, kind="stable")[:n]
+        return [(table.movies[c], round(float(s), 4)) for c, s in zip(candidates[best], scores[best])]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "movies": len(self._table.movies) if self._table is not None else None,
+                "users": len(self._user_movies),
+                "neighbors": self.k,
+                "builds": self._builds,
+                "row_refreshes": self._row_refreshes,
+                "dirty_rows": len(self._dirty),
+            }
@@ -0,0 +1,187 @@
+"""The one on-disk format for reviews, and the one reader for every review file.
+
+A reviews file is JSON Lines: a header line, then one record per review.
+
+    {"format": "movie_app.reviews", "version": 2}
+    {"v": 2, "id": 1, "movie_id": "138099", "user": "aaaa", "ts": 1760000000.0, "text": "...", "rating": 8}
+
+"ts" is a Unix timestamp (null for reviews imported from files that did not
+record one) and "rating" is optional (null, or 1-10). The journal of the
+JSON comment store holds the same records, without the header.
+
+read_reviews() also accepts the older layouts, so they can be migrated:
+
+- comments.json as {movie_id: [{"user", "comment", "id"?}, ...]} (server)
+- comments.json as {movie_id: {"comments": [text, ...]}} (GUIs)
+- a JSON Lines journal of {"id", "movie_id", "user", "comment"}
+
+Legacy JSON objects are decoded one movie at a time, so a large file is
+never held in memory whole.
+"""
+import json
+import os
+
+FORMAT = "movie_app.reviews"
+VERSION = 2
+HEADER = {"format": FORMAT, "version": VERSION}
+MIN_RATING = 1
+MAX_RATING = 10
+CHUNK_SIZE = 64 * 1024
+
+
+def make_review(review_id, movie_id, user, text, ts=None, rating=None):
+    return {"v": VERSION, "id": review_id, "movie_id": movie_id, "user": user, "ts": ts, "text": text,
+            "rating": rating}
+
+
+def encode_review(record):
+    return (json.dumps(record) + "\n").encode()
+
+
+def upgrade(entry, movie_id=None):
+    """A version-2 record for any known review entry; "id" may still be None."""
+    if isinstance(entry, str):
+        return make_review(None, movie_id, None, entry)
+    if entry.get("v") == VERSION:
+        return entry
+    return make_review(entry.get("id"), str(entry.get("movie_id", movie_id)), entry.get("user"),
+                       entry.get("comment"), entry.get("ts"), entry.get("rating"))
+
+
+def _iter_object(f):
+    """Yield (key, value) for each member of the top-level JSON object in text file `f`."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = f.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip(expected=None):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            fill()
+        if expected is not None:
+            if pos >= len(buffer) or buffer[pos] not in expected:
+                raise ValueError(f"Malformed reviews file: expected one of {expected!r}")
+            pos += 1
+            return buffer[pos - 1]
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+                return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+
+    fill()
+    skip("{")
+    skip()
+    if buffer.startswith("}", pos):
+        return
+    while True:
+        skip()
+        key = decode()
+        skip(":")
+        skip()
+        # Values are lists or objects, so a value cut off by the buffer end never decodes early.
+        yield key, decode()
+        if skip(",}") == "}":
+            return
+
+
+def read_reviews(path):
+    """Yield every review in `path` as a version-2 record, in file order.
+
+    Records without an id (older files) are numbered after the highest id seen
+    so far, which gives the same ids every time the same file is read.
+    """
+    last_id = 0
+    for record in _read_any(path):
+        if record["id"] is None:
+            record["id"] = last_id + 1
+        last_id = max(last_id, record["id"])
+        yield record
+
+
+def _read_any(path):
+    with open(path, "r") as f:
+        first = f.readline()
+        try:
+            head = json.loads(first)
+        except ValueError:
+            head = None
+        if isinstance(head, dict) and head.get("format") == FORMAT:
+            if head.get("version") != VERSION:
+                raise ValueError(f"{path}: unsupported reviews format version {head.get('version')}")
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        if isinstance(head, dict) and "movie_id" in head:
+            # A journal: one legacy record per line.
+            yield upgrade(head)
+            for line in f:
+                if line.strip():
+                    yield upgrade(json.loads(line))
+            return
+        f.seek(0)
+        for movie_id, entries in _iter_object(f):
+            if isinstance(entries, dict):
+                entries = entries.get("comments", [])
+            for entry in entries:
+                yield upgrade(entry, movie_id)
+
+
+def dump_reviews(f, records):
+    """Write a version-2 reviews file to binary file `f` and fsync it; returns the record count."""
+    count = 0
+    f.write(encode_review(HEADER))
+    for record in records:
+        f.write(encode_review(record))
+        count += 1
+    f.flush()
+    os.fsync(f.fileno())
+    return count
+
+
+def write_reviews(path, records):
+    """Atomically replace `path` with a version-2 reviews file holding `records`; returns how many."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        count = dump_reviews(f, records)
+    os.replace(tmp_path, path)
+    return count
+
+
+def convert(sources, dest):
+    """Stream the reviews of every existing file in `sources` into a new version-2 file at `dest`.
+
+    Later sources are treated as journals of the earlier ones: records whose id
+    was already written are skipped.
+    """
+    def records():
+        written = 0  # highest id from the earlier sources
+        for source in sources:
+            if not os.path.exists(source):
+                continue
+            highest = written
+            for record in read_reviews(source):
+                if record["id"] > written:
+                    highest = max(highest, record["id"])
+                    yield record
+            written = highest
+    return write_reviews(dest, records())
@@ -1,22 +1,111 @@
-import requests
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from requests.exceptions import Timeout
 from dotenv import load_dotenv
+from .details_cache import DETAILS_CACHE_BYTES, DetailsCache
+from .http_client import upstream
+from .log import get_logger
+from .metrics import MetricsRegistry
+from .per_process import PerProcess
+from .single_flight import SingleFlight
+from .ttl_cache import TTLCache
+
+log = get_logger("search")
+
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_ENTRIES = 1024
+SEARCH_CACHE_BYTES = 8 * 1024 * 1024
+# Details fetches for posters run side by side on this many threads, shared by all searches.
+POSTER_WORKERS = 16
+# Seconds a search waits for posters; results whose poster has not arrived by then go without.
+POSTER_DEADLINE = 3.0
+
+
+def normalize_query(query):
+    """Queries differing only in case or spacing share a cache entry."""
+    return " ".join(str(query).lower().split())
 
 load_dotenv()
 
 class SearchService:
-    def __init__(self):
+    def __init__(self, http=None):
+        self.http = http or upstream
         self.api_key = os.getenv("API_KEY")
         self.base_url = "https://api.watchmode.com/v1/search/"
+        # Call counts and latencies of Watchmode requests, per endpoint.
+        self.upstream_metrics = MetricsRegistry()
+        # Successful search responses by normalized query.
+        self.search_cache = TTLCache(SEARCH_CACHE_TTL, SEARCH_CACHE_ENTRIES, SEARCH_CACHE_BYTES)
+        self.poster_deadline = POSTER_DEADLINE
+        self._poster_pool = PerProcess(lambda: ThreadPoolExecutor(POSTER_WORKERS, thread_name_prefix="poster"))
+        # Title details on disk, shared by get_movie_by_id and get_movie_image and kept across restarts.
+        self.details_cache = DetailsCache(self._fetch_details)
+        # Concurrent identical upstream calls (same query, same title) share one request.
+        self.search_flight = SingleFlight()
+        self.details_flight = SingleFlight()
+
+    def configure_cache(self, ttl=SEARCH_CACHE_TTL, max_bytes=SEARCH_CACHE_BYTES, details_max_bytes=DETAILS_CACHE_BYTES):
+        self.search_cache = TTLCache(ttl, SEARCH_CACHE_ENTRIES, max_bytes)
+        self.details_cache.max_bytes = details_max_bytes
+
+    def cache_stats(self):
+        return {"search": self.search_cache.stats(), "details": self.details_cache.stats()}
+
+    def coalescing_stats(self):
+        return {"search": self.search_flight.stats(), "details": self.details_flight.stats()}
+
+    def _get(self, endpoint, url, params, timeout=10):
+        """A pooled GET, timed under `endpoint`; non-200 replies and exceptions count as errors."""
+        started = time.perf_counter()
+        try:
+            response = self.http.get(url, params=params, timeout=timeout)
+        except Exception:
+            self.upstream_metrics.record(endpoint, time.perf_counter() - started, error=True)
+            raise
+        self.upstream_metrics.record(endpoint, time.perf_counter() - started, error=response.status_code != 200)
+        return response
 
     def search_movie(self, payload):
         query = payload.get("query")    
         if not query:
             return {"status": "error", "message": "No query provided"}
 
+        key = normalize_query(query)
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            return cached
+        return self.search_flight.do(key, lambda: self._search_and_cache(key, query))
+
+    def _search_and_cache(self, key, query):
+        response, complete = self._search_upstream(query)
+        # A result that missed a poster only because of the deadline is worth asking again for.
+        if response["status"] == "success" and complete:
+            self.search_cache.put(key, response)
+        return response
+
+    def _add_posters(self, results):
+        """Fetch every result's poster concurrently, giving up at the deadline.
+
+        Returns False if any fetch was still running when the deadline passed.
+        """
+        deadline = self.poster_deadline
+        executor = self._poster_pool.get()
+        # No single fetch may outlive the deadline by much, or abandoned ones would pile up.
+        futures = {executor.submit(self.get_movie_image, result["id"], deadline): result for result in results}
+        done, pending = wait(futures, timeout=deadline)
+        for future in done:
+            image_url = future.result()
+            if image_url:
+                futures[future]['image_url'] = image_url
+        if pending:
+            log.warning("poster_deadline_missed", missed=len(pending), of=len(futures), deadline=deadline)
+        return not pending
+
+    def _search_upstream(self, query):
+        """(response, complete): complete is False if some posters missed the deadline."""
         try:
-            response = requests.get(self.base_url, params={
+            response = self._get("search", self.base_url, params={
                 "apiKey": self.api_key,
                 "search_field": "name",
                 "search_value": query
@@ -25,72 +114,66 @@ class SearchService:
             if response.status_code == 200:
                 data = response.json()
                 results = data.get("title_results", [])[:5]  # Limit to 5 results
-                filtered_results = []
+                filtered_results = [result for result in results if result.get("id")]
 
-                print(f"[SearchService] Received {len(results)} results for query: {query}")
+                log.info("search_results", sampled=True, query=query, count=len(results))
 
-                for result in results:
-                    movie_id = result.get("id")
-                    if movie_id:
-                        print(f"Fetching image for movie ID: {movie_id}")
-                        image_url = self.get_movie_image(movie_id)
-                        if image_url:
-                            result['image_url'] = image_url
-                        filtered_results.append(result)  # Add the result even without image
-
-                return {"status": "success", "results": filtered_results}
+                # Results are returned even without an image.
+                complete = self._add_posters(filtered_results)
+                return {"status": "success", "results": filtered_results}, complete
 
             else:
-                return {"status": "error", "message": f"API Error: {response.status_code}"}
+                return {"status": "error", "message": f"API Error: {response.status_code}"}, True
 
         except Timeout:
-            print(f"[SearchService] Request timed out while searching for '{query}'")
-            return {"status": "error", "message": "Search request timed out"}
+            log.warning("search_timeout", query=query)
+            return {"status": "error", "message": "Search request timed out"}, True
         except Exception as e:
-            print(f"[SearchService] Error during search: {str(e)}")
-            return {"status": "error", "message": f"Search error: {str(e)}"}
+            log.error("search_error", query=query, error=str(e))
+            return {"status": "error", "message": f"Search error: {str(e)}"}, True
 
-    def get_movie_by_id(self, movie_id):
-        """Get complete movie details by ID."""
+    def _fetch_details(self, movie_id, timeout=10):
+        """Title details from Watchmode, or None on any failure."""
+        return self.details_flight.do(str(movie_id), lambda: self._fetch_details_upstream(movie_id, timeout))
+
+    def _fetch_details_upstream(self, movie_id, timeout):
         try:
             movie_details_url = f"https://api.watchmode.com/v1/title/{movie_id}/details/"
-            response = requests.get(movie_details_url, params={
+            response = self._get("title_details", movie_details_url, params={
                 "apiKey": self.api_key
-            }, timeout=10)
+            }, timeout=timeout)
 
             if response.status_code == 200:
                 return response.json()
             else:
-                print(f"Error fetching movie ID {movie_id}: {response.status_code}")
+                log.warning("details_http_error", movie_id=movie_id, status=response.status_code)
                 return None
+        except Timeout:
+            log.warning("details_timeout", movie_id=movie_id)
+            return None
         except Exception as e:
-            print(f"Error retrieving movie ID {movie_id}: {str(e)}")
+            log.error("details_error", movie_id=movie_id, error=str(e))
             return None
 
-    def get_movie_image(self, movie_id):
+    def get_movie_by_id(self, movie_id):
+        """Get complete movie details by ID."""
+        return self.details_cache.get(movie_id)
+
+    def get_movie_image(self, movie_id, timeout=10):
         """Fetch movie details including the image URL."""
+        log.debug("fetching_image", sampled=True, movie_id=movie_id)
         try:
-            movie_details_url = f"https://api.watchmode.com/v1/title/{movie_id}/details/"
-            response = requests.get(movie_details_url, params={
-                "apiKey": self.api_key
-            }, timeout=10)  # Increased timeout to 10 seconds
+            movie_data = self.details_cache.get(movie_id, timeout)
+        except Exception as e:
+            log.error("image_error", movie_id=movie_id, error=str(e))
+            return None
+        if movie_data is None:
+            return None
+        poster_url = movie_data.get("poster")
 
-            if response.status_code == 200:
-                movie_data = response.json()
-                poster_url = movie_data.get("poster")
-
-                if poster_url:
-                    print(f"Poster URL for movie ID {movie_id}: {poster_url}")
-                    return poster_url
-                else:
-                    print(f"No poster URL found for movie ID {movie_id}")
-                    return None
-            else:
-                print(f"Error fetching movie details for movie ID {movie_id}: {response.status_code}")
-                return None
-        except Timeout:
-            print(f"[SearchService] Timeout while fetching image for movie ID {movie_id}")
+        if poster_url:
+            log.debug("poster_found", sampled=True, movie_id=movie_id, poster=poster_url)
+            return poster_url
+        else:
+            log.debug("poster_missing", sampled=True, movie_id=movie_id)
             return None
-        except Exception as e:
-            print(f"Error fetching image for movie ID {movie_id}: {e}")
-            return None
\ No newline at end of file
@@ -0,0 +1,61 @@
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait and receive the same result (or exception) instead of repeating
+    the work. The result object is shared, so callers must not mutate it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._executed = 0
+        self._coalesced = 0
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                self._coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            calls = self._executed + self._coalesced
+            return {
+                "calls": calls,
+                "executed": self._executed,
+                "coalesced": self._coalesced,
+                "saved_ratio": round(self._coalesced / calls, 3) if calls else None,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,233 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from .metrics import store_metrics
+from .review_format import make_review, read_reviews
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SQLITE_DB = os.path.join(BASE_DIR, "..", "db", "movie_app.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    password TEXT
+);
+CREATE TABLE IF NOT EXISTS favorites (
+    username TEXT NOT NULL REFERENCES users(username),
+    movie_id TEXT NOT NULL,
+    UNIQUE (username, movie_id)
+);
+CREATE INDEX IF NOT EXISTS favorites_by_movie ON favorites(movie_id);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    movie_id TEXT NOT NULL,
+    username TEXT,
+    text TEXT,
+    ts REAL,
+    rating INTEGER
+);
+CREATE INDEX IF NOT EXISTS reviews_by_movie ON reviews(movie_id, id);
+CREATE TABLE IF NOT EXISTS favorite_counts (
+    movie_id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS favorite_counts_by_count ON favorite_counts(count DESC);
+"""
+
+def encode_movie_id(movie_id):
+    # Favorites hold whatever the client sent (ints from search results, sometimes strings),
+    # so ids are stored JSON-encoded and decoded back to the same type.
+    return json.dumps(movie_id)
+
+
+class SqliteStore:
+    """Users, favorites and reviews in one SQLite database in WAL mode.
+
+    Implements the same methods as UserStore and JsonCommentStore. Each thread
+    gets its own connection, opened on first use and reused afterwards.
+    """
+
+    def __init__(self, path=SQLITE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._connect(write=True) as conn:
+            # executescript would commit the open transaction, so run the statements one by one.
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    def _connect(self, write=False):
+        conn = getattr(self._local, "conn", None)
+        # A pre-forked child must not reuse a connection opened by its parent.
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            with self._connections_lock:
+                self._connections.append(conn)
+        return _Transaction(conn, write)
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def get_user(self, username):
+        with self._connect() as conn, store_metrics.measure("users.read"):
+            row = conn.execute("SELECT id, password FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            favorites = self._favorites(conn, username)
+        return {"id": row[0], "password": row[1], "favorites": favorites}
+
+    def create_user(self, username, record):
+        with self._connect(write=True) as conn, store_metrics.measure("users.write"):
+            try:
+                conn.execute("INSERT INTO users (username, id, password) VALUES (?, ?, ?)",
+                             (username, record["id"], record.get("password")))
+            except sqlite3.IntegrityError:
+                return False
+        return True
+
+    def set_password(self, username, expected, password):
+        with self._connect(write=True) as conn, store_metrics.measure("users.write"):
+            cursor = conn.execute("UPDATE users SET password = ? WHERE username = ? AND password = ?",
+                                  (password, username, expected))
+            return cursor.rowcount == 1
+
+    def _favorites(self, conn, username):
+        rows = conn.execute("SELECT movie_id FROM favorites WHERE username = ? ORDER BY rowid", (username,))
+        return [json.loads(movie_id) for (movie_id,) in rows]
+
+    def _user_exists(self, conn, username):
+        return conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+    def get_favorites(self, username):
+        with self._connect() as conn, store_metrics.measure("users.read"):
+            if not self._user_exists(conn, username):
+                return None
+            return self._favorites(conn, username)
+
+    def add_favorite(self, username, movie_id):
+        with self._connect(write=True) as conn, store_metrics.measure("users.write"):
+            if not self._user_exists(conn, username):
+                return None
+            if self._matching_favorites(conn, username, movie_id):
+                return False
+            conn.execute("INSERT INTO favorites (username, movie_id) VALUES (?, ?)", (username, encode_movie_id(movie_id)))
+            conn.execute("INSERT INTO favorite_counts (movie_id, count) VALUES (?, 1) "
+                         "ON CONFLICT (movie_id) DO UPDATE SET count = count + 1", (str(movie_id),))
+            return True
+
+    def remove_favorite(self, username, movie_id):
+        with self._connect(write=True) as conn, store_metrics.measure("users.write"):
+            if not self._user_exists(conn, username):
+                return None
+            rowids = self._matching_favorites(conn, username, movie_id)
+            if not rowids:
+                return False
+            conn.executemany("DELETE FROM favorites WHERE rowid = ?", [(rowid,) for rowid in rowids])
+            conn.execute("UPDATE favorite_counts SET count = count - ? WHERE movie_id = ?", (len(rowids), str(movie_id)))
+            conn.execute("DELETE FROM favorite_counts WHERE movie_id = ? AND count <= 0", (str(movie_id),))
+            return True
+
+    def _matching_favorites(self, conn, username, movie_id):
+        """Rowids of the user's favorites that are `movie_id`, whether stored as int or string."""
+        rows = conn.execute("SELECT rowid, movie_id FROM favorites WHERE username = ?", (username,))
+        return [rowid for rowid, stored in rows if str(json.loads(stored)) == str(movie_id)]
+
+    def all_favorites(self):
+        with self._connect() as conn, store_metrics.measure("users.read"):
+            result = {username: [] for (username,) in conn.execute("SELECT username FROM users")}
+            for username, movie_id in conn.execute("SELECT username, movie_id FROM favorites ORDER BY rowid"):
+                result[username].append(json.loads(movie_id))
+            return result
+
+    def favorite_count(self, movie_id):
+        with self._connect() as conn, store_metrics.measure("users.read"):
+            row = conn.execute("SELECT count FROM favorite_counts WHERE movie_id = ?", (str(movie_id),)).fetchone()
+            return row[0] if row else 0
+
+    def top_favorites(self, n):
+        # Walks the count index from the top, so only n rows are read.
+        with self._connect() as conn, store_metrics.measure("users.read"):
+            return conn.execute("SELECT movie_id, count FROM favorite_counts ORDER BY count DESC LIMIT ?",
+                                (n,)).fetchall()
+
+    def add_review(self, movie_id, username, text, rating=None):
+        with self._connect(write=True) as conn, store_metrics.measure("comments.write"):
+            conn.execute("INSERT INTO reviews (movie_id, username, text, ts, rating) VALUES (?, ?, ?, ?, ?)",
+                         (movie_id, username, text, time.time(), rating))
+
+    def import_reviews(self, records):
+        """Insert review_format records as they are, ids included; returns how many."""
+        count = 0
+        with self._connect(write=True) as conn, store_metrics.measure("comments.write"):
+            for record in records:
+                conn.execute("INSERT INTO reviews (id, movie_id, username, text, ts, rating) VALUES (?, ?, ?, ?, ?, ?)",
+                             (record["id"], record["movie_id"], record["user"], record["text"], record["ts"],
+                              record["rating"]))
+                count += 1
+        return count
+
+    def get_reviews(self, movie_id, after=None, limit=None):
+        # Served straight from the (movie_id, id) index, however many reviews the movie has.
+        with self._connect() as conn, store_metrics.measure("comments.read"):
+            rows = conn.execute("SELECT id, username, text, ts, rating FROM reviews WHERE movie_id = ? AND id > ? "
+                                "ORDER BY id LIMIT ?", (movie_id, after or 0, -1 if limit is None else limit))
+            return [make_review(review_id, movie_id, user, text, ts, rating)
+                    for review_id, user, text, ts, rating in rows]
+
+    def stats(self):
+        with self._connect() as conn:
+            users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            reviews = conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+        return {"backend": "sqlite", "users": users, "reviews": reviews, "connections": len(self._connections)}
+
+
+class _Transaction:
+    """Runs a `with` block in one transaction; writers take the write lock up front (BEGIN IMMEDIATE)."""
+
+    def __init__(self, conn, write):
+        self.conn = conn
+        self.write = write
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE" if self.write else "BEGIN")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def migrate_from_json(users_path, reviews_path, store):
+    """Copy users and favorites from users.json, and reviews from any file
+    review_format can read, into `store`. Returns counts."""
+    existing = store.stats()
+    if existing["users"] or existing["reviews"]:
+        raise RuntimeError(f"{store.path} already holds data; migrate into an empty database")
+    counts = {"users": 0, "favorites": 0, "reviews": 0}
+    if os.path.exists(users_path):
+        with open(users_path) as f:
+            users = json.load(f)
+        for username, record in users.items():
+            if store.create_user(username, {"id": record["id"], "password": record.get("password")}):
+                counts["users"] += 1
+            for movie_id in record.get("favorites", []):
+                if store.add_favorite(username, movie_id):
+                    counts["favorites"] += 1
+    if os.path.exists(reviews_path):
+        counts["reviews"] = store.import_reviews(read_reviews(reviews_path))
+    return counts
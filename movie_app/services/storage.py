@@ -0,0 +1,40 @@
+from .comment_store import JsonCommentStore
+from .per_process import PerProcess
+from .sqlite_store import SQLITE_DB, SqliteStore
+from .user_store import user_store
+
+BACKENDS = ("json", "sqlite")
+
+backend = "json"
+_sqlite_path = SQLITE_DB
+
+
+def configure_storage(name="json", sqlite_path=SQLITE_DB):
+    """Select where users, favorites and reviews live. Call before serving requests."""
+    global backend, _sqlite_path
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}")
+    backend = name
+    _sqlite_path = sqlite_path
+    _backends.discard()
+
+
+def _open():
+    if backend == "sqlite":
+        store = SqliteStore(_sqlite_path)
+        return store, store
+    return user_store, JsonCommentStore()
+
+
+# (users, comments), opened on first use in each process.
+_backends = PerProcess(_open)
+
+
+def user_backend():
+    """Store for accounts and favorites (UserStore or SqliteStore)."""
+    return _backends.get()[0]
+
+
+def comment_backend():
+    """Store for reviews (JsonCommentStore or SqliteStore)."""
+    return _backends.get()[1]
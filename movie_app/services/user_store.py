@@ -0,0 +1,306 @@
+import atexit
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from .favorite_index import FavoriteIndex
+from .file_lock import locked
+from .group_commit import GroupCommit
+from .log import get_logger
+from .metrics import store_metrics
+from .per_process import background_thread
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+USER_DB = os.path.join(BASE_DIR, "..", "db", "users.json")
+
+DURABILITY_MODES = ("write_behind", "sync")
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_SHARDS = 16
+
+log = get_logger("user_store")
+
+
+def write_atomically(path, data):
+    """Replace `path` with `data` so readers only ever see the old or the new file, never a mix."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class _Shard:
+    """One partition of the users: its own lock, dict and cached JSON fragment."""
+
+    def __init__(self, users):
+        self.lock = threading.RLock()
+        self.users = users
+        self.fragment = None  # the users as '"name": {...}, ...', rebuilt after each change
+
+    def serialize(self):
+        with self.lock:
+            if self.fragment is None:
+                self.fragment = json.dumps(self.users)[1:-1]
+            return self.fragment
+
+
+def shard_index(username, shards):
+    # crc32 rather than hash() so every process and every run agrees on the shard.
+    return zlib.crc32(str(username).encode()) % shards
+
+
+class UserStore:
+    """users.json held in memory, shared by AuthService and FavoriteService.
+
+    Users are partitioned by username hash into `shards` shards, each with its
+    own lock, so requests for different users never wait on each other. A
+    FavoriteIndex kept alongside answers per-movie counts and the top
+    favorited movies without scanning users. The
+    file is read once, on first use. Reads are served from memory. Mutations
+    are persisted as whole-file snapshots written with an atomic rename; each
+    shard caches its serialised form, so a snapshot only re-serialises the
+    shards that changed since the last one. The shards still share one file:
+    users.json is the format existing installs have and migrate_to_sqlite.py
+    imports, and in shared mode one rename is what lets a worker see every
+    other worker's changes and reload them all consistently.
+
+    - "write_behind": a background thread writes a snapshot at most every
+      `flush_interval` seconds, and once more at exit.
+    - "sync": the snapshot is written before the mutating call returns.
+      Concurrent writers share snapshots through group commit.
+
+    With `shared=True` (pre-forked workers) every call holds the cross-process
+    file lock, reloads the file if another process changed it, and mutations
+    are written synchronously.
+    """
+
+    def __init__(self, path, flush_interval=DEFAULT_FLUSH_INTERVAL, durability="write_behind", shared=False,
+                 shards=DEFAULT_SHARDS):
+        self.path = path
+        self.shard_count = shards
+        self._shards = None
+        self._index = None
+        self._stamp = None
+        self._dirty = False
+        self._flushes = 0
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._flusher = background_thread(self._flush_loop, "user-store-flusher")
+        self._flush_at_exit = False
+        self._group = GroupCommit(self.flush, "user-store")
+        self.configure(flush_interval, durability, shared)
+
+    def configure(self, flush_interval=None, durability=None, shared=None):
+        if durability is not None:
+            if durability not in DURABILITY_MODES:
+                raise ValueError(f"Unknown durability mode {durability!r}")
+            self.durability = durability
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if shared is not None:
+            self.shared = shared
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        # Every write_atomically makes a new inode; mtime alone can miss two replaces within one timer tick.
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f, store_metrics.measure("users.read"):
+                users = json.load(f)
+        except FileNotFoundError:
+            users = {}
+        self._stamp = self._file_stamp()
+        self._index = FavoriteIndex.build(users)
+        partitions = [{} for _ in range(self.shard_count)]
+        for username, record in users.items():
+            partitions[shard_index(username, self.shard_count)][username] = record
+        return [_Shard(p) for p in partitions]
+
+    def _write_snapshot(self, data):
+        with store_metrics.measure("users.write"):
+            write_atomically(self.path, data)
+            self._stamp = self._file_stamp()
+            self._flushes += 1
+
+    def _loaded_shards(self):
+        if self._shards is None:
+            with self._lock:
+                if self._shards is None:
+                    self._shards = self._read()
+        return self._shards
+
+    @contextmanager
+    def _access(self, username, write=False):
+        """Context for one store operation; yields the users dict of `username`'s shard."""
+        if self.shared:
+            # One process-wide lock is enough here: the file lock serialises the workers anyway.
+            with locked(self.path, exclusive=write), self._lock:
+                if self._shards is None or self._file_stamp() != self._stamp:
+                    self._shards = self._read()
+                shard = self._shards[shard_index(username, self.shard_count)]
+                with shard.lock:
+                    yield shard.users
+                    if write and self._dirty:
+                        self.flush()
+            return
+        shard = self._loaded_shards()[shard_index(username, self.shard_count)]
+        with shard.lock:
+            yield shard.users
+        # Not only when _dirty: a flush that already cleared it may still be writing this change.
+        if write and self.durability == "sync":
+            self._group.commit()
+
+    @contextmanager
+    def _index_access(self):
+        """Context for reading the favorites reverse index; yields it."""
+        if self.shared:
+            with locked(self.path, exclusive=False), self._lock:
+                if self._shards is None or self._file_stamp() != self._stamp:
+                    self._shards = self._read()
+                yield self._index
+            return
+        self._loaded_shards()
+        yield self._index
+
+    def _commit(self, username):
+        """Called with the shard lock held, after that shard's users changed."""
+        self._shards[shard_index(username, self.shard_count)].fragment = None
+        self._dirty = True
+        if not self.shared and self.durability == "write_behind":
+            self._ensure_flusher()
+
+    def _ensure_flusher(self):
+        if not self._flush_at_exit:
+            with self._lock:
+                if not self._flush_at_exit:
+                    atexit.register(self.flush)
+                    self._flush_at_exit = True
+        self._flusher.get()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                log.error("user_store_flush_failed", path=self.path, error=str(e))
+
+    def flush(self):
+        """Write a snapshot now if anything changed since the last one."""
+        # Assembling and writing under one lock keeps an older snapshot from landing after a newer one.
+        with self._write_lock:
+            if not self._dirty or self._shards is None:
+                return
+            self._dirty = False
+            fragments = [shard.serialize() for shard in self._shards]
+            try:
+                self._write_snapshot("{" + ", ".join(f for f in fragments if f) + "}")
+            except OSError:
+                self._dirty = True
+                raise
+
+    def get_user(self, username):
+        with self._access(username) as users:
+            user = users.get(username)
+            if user is None:
+                return None
+            return {**user, "favorites": list(user.get("favorites", []))}
+
+    def create_user(self, username, record):
+        """Add a user; returns False if the username is taken."""
+        with self._access(username, write=True) as users:
+            if username in users:
+                return False
+            users[username] = record
+            self._commit(username)
+            return True
+
+    def set_password(self, username, expected, password):
+        """Replace the password if it is still `expected`; returns whether it was replaced."""
+        with self._access(username, write=True) as users:
+            user = users.get(username)
+            if user is None or user.get("password") != expected:
+                return False
+            user["password"] = password
+            self._commit(username)
+            return True
+
+    def get_favorites(self, username):
+        """The user's favorite ids, or None if the user does not exist."""
+        with self._access(username) as users:
+            if username not in users:
+                return None
+            return list(users[username].get("favorites", []))
+
+    def add_favorite(self, username, movie_id):
+        """True if added, False if already present, None if the user does not exist."""
+        with self._access(username, write=True) as users:
+            if username not in users:
+                return None
+            favorites = users[username].setdefault("favorites", [])
+            # 5 and "5" are the same movie (the favorites index counts them as one, too).
+            if any(str(favorite) == str(movie_id) for favorite in favorites):
+                return False
+            favorites.append(movie_id)
+            self._index.add(movie_id, username)
+            self._commit(username)
+            return True
+
+    def remove_favorite(self, username, movie_id):
+        """True if removed, False if it was not a favorite, None if the user does not exist."""
+        with self._access(username, write=True) as users:
+            if username not in users:
+                return None
+            favorites = users[username].get("favorites", [])
+            kept = [favorite for favorite in favorites if str(favorite) != str(movie_id)]
+            if len(kept) == len(favorites):
+                return False
+            favorites[:] = kept
+            self._index.remove(movie_id, username)
+            self._commit(username)
+            return True
+
+    def all_favorites(self):
+        """{username: [movie_id, ...]} for every user, read one shard at a time."""
+        with self._index_access():
+            result = {}
+            for shard in self._shards:
+                with shard.lock:
+                    result.update((name, list(user.get("favorites", []))) for name, user in shard.users.items())
+            return result
+
+    def favorite_count(self, movie_id):
+        """How many users have `movie_id` among their favorites."""
+        with self._index_access() as index:
+            return index.count(movie_id)
+
+    def top_favorites(self, n):
+        """[(movie_id, count), ...] for the n most favorited movies, most favorited first."""
+        with self._index_access() as index:
+            return index.top(n)
+
+    def stats(self):
+        shards = self._shards
+        return {
+            "backend": "json",
+            "users": sum(len(shard.users) for shard in shards) if shards is not None else None,
+            "shards": self.shard_count,
+            "favorited_movies": len(self._index) if self._index is not None else None,
+            "dirty": self._dirty,
+            "snapshots_written": self._flushes,
+            "durability": "shared" if self.shared else self.durability,
+            "flush_interval": self.flush_interval,
+            "group_commit": self._group.stats(),
+        }
+
+
+# The single in-process store used by default by AuthService and FavoriteService.
+user_store = UserStore(USER_DB)
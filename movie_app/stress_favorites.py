@@ -0,0 +1,80 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from services.user_store import DEFAULT_SHARDS, DURABILITY_MODES, UserStore
+
+
+def toggle(store, username, movie_id):
+    if not store.add_favorite(username, movie_id):
+        store.remove_favorite(username, movie_id)
+
+
+def run(shards, durability, users, threads, toggles):
+    """Toggle favorites from many threads at once and check no update was lost.
+
+    Every thread owns its own movie ids (but shares users with other threads),
+    so the final state of each (user, movie) pair is known: present if it was
+    toggled an odd number of times.
+    """
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, "users.json")
+    try:
+        store = UserStore(path, durability=durability, shards=shards)
+        usernames = [f"user{i}" for i in range(users)]
+        for username in usernames:
+            store.create_user(username, {"id": username, "password": None, "favorites": []})
+
+        expected = {}
+        expected_lock = threading.Lock()
+
+        def worker(index):
+            rng = random.Random(index)
+            counts = {}
+            for _ in range(toggles):
+                key = (rng.choice(usernames), index * 1000 + rng.randrange(20))
+                toggle(store, *key)
+                counts[key] = counts.get(key, 0) + 1
+            with expected_lock:
+                expected.update(counts)
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        store.flush()
+
+        reloaded = UserStore(path)
+        lost = 0
+        for (username, movie_id), count in expected.items():
+            if (movie_id in reloaded.get_favorites(username)) != (count % 2 == 1):
+                lost += 1
+        total = threads * toggles
+        print(f"shards={shards:<3} durability={durability:<12} {total} toggles in {elapsed:.2f}s "
+              f"({total / elapsed:,.0f}/s), lost updates: {lost}")
+        return lost
+    finally:
+        shutil.rmtree(workdir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent favorites toggles against UserStore")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--toggles", type=int, default=2000, help="toggles per thread")
+    parser.add_argument("--durability", choices=DURABILITY_MODES, default="write_behind")
+    args = parser.parse_args(argv)
+
+    lost = sum(run(shards, args.durability, args.users, args.threads, args.toggles)
+               for shards in (1, DEFAULT_SHARDS))
+    raise SystemExit(1 if lost else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_WORKERS = 32
+DEFAULT_MAX_QUEUE = 256
+MIN_RETRY_AFTER = 0.05
+
+
+class ServerBusy(Exception):
+    """Raised by WorkerPool.submit when the pending-request queue is full."""
+
+    def __init__(self, retry_after):
+        super().__init__("Server busy, retry shortly")
+        self.retry_after = retry_after
+
+    def response(self):
+        return {"status": "busy", "message": str(self), "retry_after": self.retry_after}
+
+
+class WorkerPool:
+    """Fixed set of worker threads fed from a bounded queue.
+
+    When the queue is full new work is rejected immediately with ServerBusy
+    instead of being queued, so a load spike sheds requests rather than making
+    every request slow.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._active = 0
+        self._peak_queue_depth = 0
+        self._avg_service_time = 0.0
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"request-worker-{i}", daemon=True).start()
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            self._queue.put_nowait((future, fn, args))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise ServerBusy(self.retry_after())
+        with self._lock:
+            self._submitted += 1
+            self._peak_queue_depth = max(self._peak_queue_depth, self._queue.qsize())
+        return future
+
+    def _work(self):
+        while True:
+            future, fn, args = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._active += 1
+            started = time.monotonic()
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    # Exponentially weighted so the retry hint follows the current load.
+                    self._avg_service_time += 0.1 * (elapsed - self._avg_service_time)
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained, as a hint for rejected clients."""
+        backlog = self._queue.qsize() + self._active
+        return round(max(MIN_RETRY_AFTER, backlog * self._avg_service_time / self.workers), 3)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self._active,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "peak_queue_depth": self._peak_queue_depth,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_service_ms": round(self._avg_service_time * 1000, 3),
+            }